@@ -0,0 +1,172 @@
+import json
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from logScript import logger
+
+load_dotenv()
+
+# Словарь категорий: {"Категория": ["ключевое слово", "фраза из слов", "префикс*"]}.
+# Порядок категорий решает только ничьи по числу совпадений.
+CATEGORIES_FILE = Path(os.getenv("CATEGORIES_FILE", Path(__file__).resolve().parent / "categories.json"))
+# Как часто (в секундах) проверять, не изменился ли файл словаря
+CLASSIFIER_RELOAD_INTERVAL = float(os.getenv("CLASSIFIER_RELOAD_INTERVAL", "30"))
+
+UNDEFINED = "Не определена"
+
+# Слова текста: буквы и цифры, через дефис допускаются составные ("машино-место")
+WORD_RE = re.compile(r"[0-9a-zа-я]+(?:-[0-9a-zа-я]+)*")
+
+# Окончания, которые отрезаются от слов и ключевых слов, чтобы "квартиры", "квартирой"
+# и "квартира" совпадали. Порядок — от длинных к коротким.
+ENDINGS = sorted({
+    "иями", "ями", "ами", "иях", "иям", "ием", "ией",
+    "ого", "его", "ому", "ему", "ыми", "ими",
+    "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие", "ых", "их", "ым", "им",
+    "ую", "юю", "ов", "ев", "ом", "ем", "ах", "ях", "ам", "ям", "ию", "ия", "ии",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+}, key=len, reverse=True)
+MIN_STEM = 3
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """Отрезает самое длинное подходящее окончание, оставляя основу не короче MIN_STEM букв."""
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD_RE.findall(text.lower().replace("ё", "е"))]
+
+
+class Classifier:
+    """
+    Классификатор по ключевым словам, собранный один раз из словаря категорий.
+    Текст один раз режется на основы слов, и для каждой позиции словарь проверяется
+    поиском по хешу: фраз, начинающихся с этой основы, и префиксов слова. Стоимость
+    классификации зависит от длины текста, а не от размера словаря.
+    Каждое совпадение добавляет категории столько очков, сколько в нём слов;
+    побеждает категория с наибольшим счётом, при равенстве — стоящая раньше в словаре.
+    """
+
+    def __init__(self, categories):
+        self.categories = list(categories)
+        self._order = {category: i for i, category in enumerate(self.categories)}
+        # Однословные ключи: основа -> категории
+        self.words = {}
+        # Фразы из нескольких слов: кортеж основ -> категории
+        self.phrases = {}
+        # Для первой основы каждой фразы — длина самой длинной фразы с неё
+        self.starts = {}
+        # Ключи с "*" на конце: префикс слова -> категории
+        self.prefixes = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                if keyword.endswith("*"):
+                    prefix = keyword[:-1].lower().replace("ё", "е")
+                    self.prefixes.setdefault(prefix, []).append(category)
+                    continue
+                words = tuple(tokenize(keyword))
+                if len(words) == 1:
+                    self.words.setdefault(words[0], []).append(category)
+                elif words:
+                    self.phrases.setdefault(words, []).append(category)
+                    self.starts[words[0]] = max(self.starts.get(words[0], 0), len(words))
+        self.prefix_lengths = sorted({len(prefix) for prefix in self.prefixes})
+
+    def scores(self, text):
+        """Возвращает {категория: очки} для всех категорий, у которых нашлись совпадения."""
+        result = {}
+        words = WORD_RE.findall(text.lower().replace("ё", "е"))
+        stems = [stem(word) for word in words]
+        single, phrases, starts = self.words, self.phrases, self.starts
+        prefixes, prefix_lengths = self.prefixes, self.prefix_lengths
+        total = len(stems)
+        for i, first in enumerate(stems):
+            categories = single.get(first)
+            if categories:
+                for category in categories:
+                    result[category] = result.get(category, 0) + 1
+            longest = starts.get(first)
+            if longest:
+                for n in range(2, min(longest, total - i) + 1):
+                    categories = phrases.get(tuple(stems[i:i + n]))
+                    if categories:
+                        for category in categories:
+                            result[category] = result.get(category, 0) + n
+            if prefix_lengths:
+                word = words[i]
+                for length in prefix_lengths:
+                    if length > len(word):
+                        break
+                    categories = prefixes.get(word[:length])
+                    if categories:
+                        for category in categories:
+                            result[category] = result.get(category, 0) + 1
+        return result
+
+    def classify(self, text):
+        scores = self.scores(text)
+        if not scores:
+            return UNDEFINED
+        return max(scores, key=lambda category: (scores[category], -self._order[category]))
+
+
+def load_classifier(path=CATEGORIES_FILE):
+    with open(path, encoding="utf-8") as f:
+        return Classifier(json.load(f))
+
+
+class _ReloadingClassifier:
+    """
+    Держит классификатор из файла словаря и пересобирает его, когда файл меняется.
+    Если новый файл не читается, продолжает работать со старым словарём.
+    """
+
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._mtime = self.path.stat().st_mtime
+        self._classifier = load_classifier(self.path)
+        self._checked = time.monotonic()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked < self.interval:
+            return
+        with self._lock:
+            self._checked = now
+            try:
+                mtime = self.path.stat().st_mtime
+                if mtime == self._mtime:
+                    return
+                self._classifier = load_classifier(self.path)
+                self._mtime = mtime
+                logger.info(f"Словарь категорий {self.path} перечитан")
+            except Exception as e:
+                logger.error(f"Не удалось перечитать словарь категорий {self.path}: {e}")
+
+    def get(self):
+        self._maybe_reload()
+        return self._classifier
+
+
+_current = None
+
+
+def get_classifier():
+    """Классификатор по CATEGORIES_FILE; загружается при первом обращении и перечитывается при изменении файла."""
+    global _current
+    if _current is None:
+        _current = _ReloadingClassifier(CATEGORIES_FILE, CLASSIFIER_RELOAD_INTERVAL)
+    return _current.get()
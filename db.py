@@ -1,8 +1,12 @@
+import asyncio
+import datetime
 import os
+from pathlib import Path
 
-import psycopg2
+import asyncpg
 from dotenv import load_dotenv
 from logScript import logger
+from metrics import ACKS, DB_SECONDS, timed_query
 load_dotenv(dotenv_path='.env')
 
 db_name = os.getenv("DB_NAME")
@@ -11,57 +15,668 @@ db_password = os.getenv("DB_PASSWORD")
 db_host = os.getenv("DB_HOST")
 db_port = os.getenv("DB_PORT")
 
-def get_db_connection():
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+# Сколько строк забираем из messages за один запрос (keyset-пагинация по id)
+DB_PAGE_SIZE = int(os.getenv("DB_PAGE_SIZE", "100"))
+# Срок аренды записей и пар (лот, канал) воркером; продлевается, пока воркер жив
+LEASE_SECONDS = float(os.getenv("LEASE_SECONDS", "300"))
+# Подтверждения отправки копятся и пишутся одним UPDATE по размеру пачки или по времени
+ACK_BATCH_SIZE = int(os.getenv("ACK_BATCH_SIZE", "50"))
+ACK_FLUSH_INTERVAL = float(os.getenv("ACK_FLUSH_INTERVAL", "2"))
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+# Произвольный ключ advisory-блокировки, чтобы миграции не накатывались параллельно
+MIGRATIONS_LOCK_KEY = 7316001
+# Ключ advisory-блокировок WORKER_ID (вторая половина ключа — хеш самого WORKER_ID)
+WORKER_LOCK_KEY = 7316002
+WORKER_LOCK_RETRY = float(os.getenv("WORKER_LOCK_RETRY", "1"))
+
+# Статусы пар (лот, канал) в журнале lot_deliveries
+DELIVERY_PENDING = "pending"
+DELIVERY_SENDING = "sending"
+DELIVERY_SENT = "sent"
+DELIVERY_SKIPPED = "skipped"
+DELIVERY_FAILED = "failed"
+
+# Причина окончательного пропуска записи в messages.skip_reason: дата публикации вне окна
+SKIP_STALE = "stale"
+
+# Канал NOTIFY из триггера migrations/002_messages_notify.sql
+NOTIFY_CHANNEL = "messages_new"
+LISTEN_RECONNECT_DELAY = float(os.getenv("LISTEN_RECONNECT_DELAY", "5"))
+
+# Пул создаётся один раз (init_db_pool, при старте или на первом проходе с доступной базой)
+# и живёт до остановки бота
+pool = None
+
+def _connect_kwargs():
+    return dict(
+        host=db_host,
+        port=int(db_port) if db_port else None,
+        database=db_name,
+        user=db_user,
+        password=db_password
+    )
+
+async def init_db_pool():
+    """
+    Создаёт пул и сразу накатывает миграции, так что все запросы работают с актуальной схемой,
+    даже если при старте бота база была недоступна и пул создаётся позже, на очередном проходе.
+    Если миграции не применились, пул закрывается и следующий вызов попробует снова.
+    """
+    global pool
+    if pool is not None:
+        return pool
     try:
-        connection = psycopg2.connect(
-            host=db_host,
-            port=db_port,
-            database=db_name,
-            user=db_user,
-            password=db_password
+        pool = await asyncpg.create_pool(
+            **_connect_kwargs(),
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE
         )
-        return connection
     except Exception as e:
         logger.error(f"Ошибка при подключении к базе данных: {e}")
+        pool = None
+        return pool
+    if not await apply_migrations():
+        await close_db_pool()
+    return pool
+
+async def close_db_pool():
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+
+async def apply_migrations():
+    """
+    Накатывает SQL-файлы из migrations/ по порядку имён.
+    Применённые версии запоминаются в таблице schema_migrations.
+    """
+    if pool is None:
+        logger.error("Пул соединений с базой данных не инициализирован")
+        return False
+    try:
+        async with pool.acquire() as conn:
+            await conn.execute("SELECT pg_advisory_lock($1)", MIGRATIONS_LOCK_KEY)
+            try:
+                await conn.execute('''
+                        CREATE TABLE IF NOT EXISTS schema_migrations (
+                            version TEXT PRIMARY KEY,
+                            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                        )
+                        ''')
+                applied = {row['version'] for row in await conn.fetch("SELECT version FROM schema_migrations")}
+                for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+                    if path.stem in applied:
+                        continue
+                    async with conn.transaction():
+                        await conn.execute(path.read_text(encoding="utf-8"))
+                        await conn.execute("INSERT INTO schema_migrations (version) VALUES ($1)", path.stem)
+                    logger.info(f"Применена миграция {path.name}")
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATIONS_LOCK_KEY)
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при применении миграций: {e}")
+        return False
+
+async def fetch_unsent_links(lease_id, window=None, page_size=DB_PAGE_SIZE, lease_seconds=LEASE_SECONDS):
+    """
+    Асинхронный генератор неотправленных записей (id, ссылка) в порядке id.
+    Если задано окно дат публикации window = (начало, конец), записи с известной
+    publication_date вне окна не забираются; записи без даты забираются всегда.
+    Дату пишет только сам бот после загрузки страницы, так что новые записи (и весь бэклог
+    при первом проходе) приходят без неё: окно отсекает их уже после загрузки, при разборе.
+    Записи забираются в аренду страницами по page_size через FOR UPDATE SKIP LOCKED:
+    строки, которые держит другой воркер, пропускаются, а строки с истёкшей арендой
+    забираются снова. После каждой страницы соединение сразу возвращается в пул,
+    а следующая страница начинается после последнего увиденного id.
+    """
+    if pool is None:
+        logger.error("Пул соединений с базой данных не инициализирован")
+        return
+    # Условие по send_to_channel и тип_сообщения совпадает с частичным индексом messages_unsent_id_idx
+    query = '''
+            WITH claimable AS (
+                SELECT id
+                FROM messages
+                WHERE send_to_channel = FALSE
+                  AND тип_сообщения IN ('Аукцион', 'Публичка', 'Отчет оценщика')
+                  AND id > $1
+                  AND (lease_expires_at IS NULL OR lease_expires_at < now())
+                  AND (publication_date IS NULL OR publication_date BETWEEN $5 AND $6)
+                ORDER BY id
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE messages m
+            SET lease_id = $3, lease_expires_at = now() + make_interval(secs => $4)
+            FROM claimable
+            WHERE m.id = claimable.id
+            RETURNING m.id, m.сообщение_ссылка
+        '''
+    start, end = window or (datetime.date.min, datetime.date.max)
+    last_id = 0
+    while True:
+        try:
+            with DB_SECONDS.labels(query="claim").time():
+                rows = await pool.fetch(query, last_id, page_size, lease_id, lease_seconds, start, end)
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении запроса: {e}")
+            return
+        if not rows:
+            return
+        # RETURNING не гарантирует порядок
+        rows = sorted(rows, key=lambda row: row['id'])
+        for row in rows:
+            yield row['id'], row['сообщение_ссылка']
+        last_id = rows[-1]['id']
+
+@timed_query("count_unsent")
+async def count_unsent():
+    """Сколько записей ждут отправки (для метрики efrsb_backlog_messages) или None, если база недоступна."""
+    if pool is None:
+        return None
+    try:
+        return await pool.fetchval(
+            '''
+            SELECT count(*) FROM messages
+            WHERE send_to_channel = FALSE AND тип_сообщения IN ('Аукцион', 'Публичка', 'Отчет оценщика')
+            '''
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении запроса: {e}")
+        return None
+
+@timed_query("skip_stale")
+async def skip_stale_messages(window):
+    """
+    Одним запросом закрывает неотправленные записи, у которых publication_date известна
+    и лежит вне окна window = (начало, конец): страницы таких записей даже не скачиваются.
+    Дата известна только у записей, страницу которых бот уже загружал (например, окно с тех пор
+    сдвинулось); запись, которую ещё ни разу не загружали, этим запросом не закрыть.
+    Записи в аренде у живого воркера не трогаются. Возвращает число закрытых записей или None.
+    """
+    if pool is None:
+        logger.error("Пул соединений с базой данных не инициализирован")
+        return None
+    try:
+        result = await pool.execute(
+            '''
+            UPDATE messages
+            SET send_to_channel = TRUE, skip_reason = $3, lease_id = NULL, lease_expires_at = NULL
+            WHERE send_to_channel = FALSE
+              AND тип_сообщения IN ('Аукцион', 'Публичка', 'Отчет оценщика')
+              AND publication_date NOT BETWEEN $1 AND $2
+              AND (lease_expires_at IS NULL OR lease_expires_at < now())
+            ''',
+            window[0], window[1], SKIP_STALE
+        )
+        return int(result.split()[-1])
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении запроса: {e}")
+        return None
+
+@timed_query("mark_stale")
+async def mark_stale(message_id, published):
+    """Окончательно закрывает запись, дата публикации которой вне окна. Возвращает True при успехе."""
+    if pool is None:
+        logger.error("Пул соединений с базой данных не инициализирован")
+        return False
+    try:
+        await pool.execute(
+            '''
+            UPDATE messages
+            SET send_to_channel = TRUE, skip_reason = $3, publication_date = $2,
+                lease_id = NULL, lease_expires_at = NULL
+            WHERE id = $1
+            ''',
+            message_id, published, SKIP_STALE
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении запроса: {e}")
+        return False
+
+@timed_query("extend_leases")
+async def extend_leases(lease_id, lease_seconds=LEASE_SECONDS):
+    """Продлевает аренду всех записей и пар (лот, канал), которые держит lease_id."""
+    if pool is None:
+        return False
+    try:
+        async with pool.acquire() as conn:
+            await conn.execute(
+                '''
+                UPDATE messages SET lease_expires_at = now() + make_interval(secs => $2)
+                WHERE lease_id = $1 AND send_to_channel = FALSE
+                ''',
+                lease_id, lease_seconds
+            )
+            await conn.execute(
+                '''
+                UPDATE lot_deliveries SET lease_expires_at = now() + make_interval(secs => $2)
+                WHERE lease_id = $1 AND status = 'sending'
+                ''',
+                lease_id, lease_seconds
+            )
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при продлении аренды: {e}")
+        return False
+
+@timed_query("release_leases")
+async def release_leases(lease_id):
+    """
+    Снимает аренду lease_id, чтобы незаконченное сразу подхватил другой воркер: при остановке
+    процесса и при запуске процесса с тем же WORKER_ID после падения предыдущего.
+    Записи освобождаются, пары (лот, канал), которые ещё ни разу не отправлялись, возвращаются
+    в pending. Пары с attempted_at могли уже опубликоваться: они отвязываются от lease_id, чтобы
+    extend_leases их больше не продлевал, и повторяются, только когда истечёт их аренда.
+    Возвращает (записей, пар в pending) или None, если база недоступна.
+    """
+    if pool is None:
+        return None
+    try:
+        async with pool.acquire() as conn:
+            messages = await conn.execute(
+                '''
+                UPDATE messages SET lease_id = NULL, lease_expires_at = NULL
+                WHERE lease_id = $1 AND send_to_channel = FALSE
+                ''',
+                lease_id
+            )
+            deliveries = await conn.execute(
+                '''
+                UPDATE lot_deliveries
+                SET status = 'pending', lease_id = NULL, lease_expires_at = NULL, updated_at = now()
+                WHERE lease_id = $1 AND status = 'sending' AND attempted_at IS NULL
+                ''',
+                lease_id
+            )
+            await conn.execute(
+                "UPDATE lot_deliveries SET lease_id = NULL WHERE lease_id = $1 AND status = 'sending'",
+                lease_id
+            )
+        return int(messages.split()[-1]), int(deliveries.split()[-1])
+    except Exception as e:
+        logger.error(f"Ошибка при снятии аренды: {e}")
+        return None
+
+@timed_query("release_message")
+async def release_message(message_id, lease_id):
+    """
+    Снимает аренду lease_id с записи, которую не удалось обработать (ошибка загрузки, разбора
+    или журнала), и с её пар (лот, канал) — так же, как release_leases: иначе extend_leases
+    продлевал бы аренду, пока жив процесс, и запись не бралась бы снова.
+    Следующий проход попробует её ещё раз. Возвращает True при успехе.
+    """
+    if pool is None:
+        return False
+    try:
+        async with pool.acquire() as conn:
+            await conn.execute(
+                '''
+                UPDATE messages SET lease_id = NULL, lease_expires_at = NULL
+                WHERE id = $1 AND lease_id = $2 AND send_to_channel = FALSE
+                ''',
+                message_id, lease_id
+            )
+            await conn.execute(
+                '''
+                UPDATE lot_deliveries
+                SET status = 'pending', lease_id = NULL, lease_expires_at = NULL, updated_at = now()
+                WHERE message_id = $1 AND lease_id = $2 AND status = 'sending' AND attempted_at IS NULL
+                ''',
+                message_id, lease_id
+            )
+            await conn.execute(
+                "UPDATE lot_deliveries SET lease_id = NULL WHERE message_id = $1 AND lease_id = $2 AND status = 'sending'",
+                message_id, lease_id
+            )
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при снятии аренды записи {message_id}: {e}")
+        return False
+
+async def lock_worker(worker_id, stop):
+    """
+    Берёт advisory-блокировку WORKER_ID на отдельном соединении и держит её, пока соединение открыто:
+    два процесса с одним WORKER_ID не работают одновременно. Если её держит предыдущий процесс,
+    который ещё завершает работу, ждёт его, пока не взведён asyncio.Event stop.
+    Возвращает соединение (закрыть его — отпустить блокировку) или None, если дождаться не удалось.
+    """
+    waiting = False
+    while not stop.is_set():
+        conn = None
+        locked = False
+        try:
+            conn = await asyncpg.connect(**_connect_kwargs())
+            while not stop.is_set():
+                locked = await conn.fetchval(
+                    "SELECT pg_try_advisory_lock($1, hashtext($2))", WORKER_LOCK_KEY, worker_id
+                )
+                if locked:
+                    if waiting:
+                        logger.info(f"Предыдущий процесс WORKER_ID={worker_id} завершился, продолжаем его работу")
+                    return conn
+                if not waiting:
+                    logger.info(f"WORKER_ID={worker_id} ещё занят другим процессом, ждём его остановки")
+                    waiting = True
+                await asyncio.sleep(WORKER_LOCK_RETRY)
+        except Exception as e:
+            logger.error(f"Ошибка блокировки WORKER_ID={worker_id}: {e}")
+        finally:
+            if not locked and conn is not None and not conn.is_closed():
+                await conn.close()
+        if not stop.is_set():
+            await asyncio.sleep(LISTEN_RECONNECT_DELAY)
+    return None
+
+async def listen_new_messages(wakeup):
+    """
+    Держит отдельное соединение с LISTEN на NOTIFY_CHANNEL и взводит asyncio.Event wakeup
+    на каждое оповещение о новых сообщениях. При потере соединения переподключается;
+    после каждого (пере)подключения wakeup тоже взводится, чтобы не пропустить вставки,
+    случившиеся, пока слушателя не было. Работает, пока задачу не отменят.
+    """
+    def on_notify(connection, pid, channel, payload):
+        wakeup.set()
+
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(**_connect_kwargs())
+            lost = asyncio.Event()
+            conn.add_termination_listener(lambda connection: lost.set())
+            await conn.add_listener(NOTIFY_CHANNEL, on_notify)
+            logger.info(f"Подписка на {NOTIFY_CHANNEL} установлена")
+            wakeup.set()
+            await lost.wait()
+            logger.warning(f"Соединение LISTEN {NOTIFY_CHANNEL} потеряно")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка подписки на {NOTIFY_CHANNEL}: {e}")
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(LISTEN_RECONNECT_DELAY)
+
+@timed_query("ack")
+async def mark_many_as_sent(message_ids):
+    """
+    Помечает пачку записей как отправленные одним запросом и снимает с них аренду.
+    Записи, у которых в журнале ещё есть пары pending/sending (например, их отправляет
+    другой воркер), не подтверждаются — их подтвердит тот, кто закончит последним. С таких
+    записей только снимается аренда: если тот воркер упал, запись заберёт следующий проход.
+    Возвращает True при успехе.
+    """
+    if not message_ids:
+        return True
+    if pool is None:
+        logger.error("Пул соединений с базой данных не инициализирован")
+        return False
+    try:
+        query = '''
+                UPDATE messages SET send_to_channel = TRUE, lease_id = NULL, lease_expires_at = NULL
+                WHERE id = ANY($1)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM lot_deliveries d
+                      WHERE d.message_id = messages.id AND d.status IN ('pending', 'sending')
+                  )
+                '''
+        async with pool.acquire() as conn:
+            result = await conn.execute(query, list(message_ids))
+            if int(result.split()[-1]) < len(message_ids):
+                await conn.execute(
+                    '''
+                    UPDATE messages SET lease_id = NULL, lease_expires_at = NULL
+                    WHERE id = ANY($1) AND send_to_channel = FALSE
+                    ''',
+                    list(message_ids)
+                )
+        ACKS.inc(int(result.split()[-1]))
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении запроса: {e}")
+        return False
+
+async def mark_as_sent(message_id):
+    return await mark_many_as_sent([message_id])
+
+@timed_query("ack_completed")
+async def ack_completed_messages():
+    """
+    Помечает отправленными записи, у которых в журнале все пары уже в окончательном статусе,
+    а подтверждение не дошло до базы (процесс остановился раньше сброса AckBatcher).
+    Так после перезапуска они не скачиваются и не разбираются заново.
+    Записи в аренде у другого живого воркера не трогаются. Возвращает число записей или None.
+    """
+    if pool is None:
+        logger.error("Пул соединений с базой данных не инициализирован")
+        return None
+    try:
+        result = await pool.execute(
+            '''
+            UPDATE messages SET send_to_channel = TRUE, lease_id = NULL, lease_expires_at = NULL
+            WHERE send_to_channel = FALSE
+              AND тип_сообщения IN ('Аукцион', 'Публичка', 'Отчет оценщика')
+              AND (lease_expires_at IS NULL OR lease_expires_at < now())
+              AND EXISTS (SELECT 1 FROM lot_deliveries d WHERE d.message_id = messages.id)
+              AND NOT EXISTS (
+                  SELECT 1 FROM lot_deliveries d
+                  WHERE d.message_id = messages.id AND d.status IN ('pending', 'sending')
+              )
+            '''
+        )
+        acked = int(result.split()[-1])
+        ACKS.inc(acked)
+        return acked
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении запроса: {e}")
         return None
 
-def fetch_unsent_links(batch_size=100):
-    conn = get_db_connection()
-    if conn is None:
-        return  # Если не удалось получить соединение, функция ничего не возвращает.
-    try:
-        # Используем контекстный менеджер для соединения и курсора
-        with conn:
-            with conn.cursor() as cur:
-                query = '''
-                        SELECT id, сообщение_ссылка 
-                        FROM messages
-                        WHERE send_to_channel = FALSE 
-                          AND тип_сообщения IN ('Аукцион', 'Публичка', 'Отчет оценщика')
+@timed_query("register_deliveries")
+async def register_deliveries(message_id, deliveries, lease_id, published=None, lease_seconds=LEASE_SECONDS):
+    """
+    Заносит в журнал lot_deliveries пары (lot_no, destination, status) сообщения message_id
+    (уже записанные пары не трогает) и забирает в отправку под lease_id все пары в статусе pending,
+    а также sending с истёкшей арендой. Возвращает множество забранных пар {(lot_no, destination)}
+    или None, если база недоступна. Пару, забранную другим воркером, этот воркер не получит.
+    published — дата публикации из шапки страницы, сохраняется в messages.publication_date.
+    """
+    if pool is None:
+        logger.error("Пул соединений с базой данных не инициализирован")
+        return None
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                if published is not None:
+                    await conn.execute(
+                        "UPDATE messages SET publication_date = $2 WHERE id = $1 AND publication_date IS DISTINCT FROM $2",
+                        message_id, published
+                    )
+                await conn.executemany(
                     '''
-                cur.execute(query)
-                while True:
-                    rows = cur.fetchmany(batch_size)
-                    if not rows:
-                        break
-                    for row in rows:
-                        yield row
+                    INSERT INTO lot_deliveries (message_id, lot_no, destination, status)
+                    VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (message_id, lot_no, destination) DO NOTHING
+                    ''',
+                    [(message_id, lot_no, destination, status) for lot_no, destination, status in deliveries]
+                )
+                rows = await conn.fetch(
+                    '''
+                    UPDATE lot_deliveries
+                    SET status = 'sending', lease_id = $2, attempted_at = NULL,
+                        lease_expires_at = now() + make_interval(secs => $3), updated_at = now()
+                    WHERE message_id = $1
+                      AND (status = 'pending' OR (status = 'sending' AND lease_expires_at < now()))
+                    RETURNING lot_no, destination
+                    ''',
+                    message_id, lease_id, lease_seconds
+                )
+        return {(row['lot_no'], row['destination']) for row in rows}
     except Exception as e:
         logger.error(f"Ошибка при выполнении запроса: {e}")
         return None
 
-def mark_as_sent(message_id):
-    conn = get_db_connection()
-    if conn is None:
-        return
+@timed_query("record_delivery")
+async def record_delivery(message_id, lot_no, destination, status, tg_message_id=None, attempts=0, error=None):
+    """Записывает итог отправки пары (лот, канал). Возвращает True при успехе."""
+    if pool is None:
+        logger.error("Пул соединений с базой данных не инициализирован")
+        return False
+    try:
+        await pool.execute(
+            '''
+            UPDATE lot_deliveries
+            SET status = $4, tg_message_id = $5, attempts = attempts + $6, error = $7, updated_at = now(),
+                lease_id = NULL, lease_expires_at = NULL
+            WHERE message_id = $1 AND lot_no = $2 AND destination = $3
+            ''',
+            message_id, lot_no, destination, status, tg_message_id, attempts, error
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении запроса: {e}")
+        return False
 
+@timed_query("mark_attempted")
+async def mark_attempted(message_id, lot_nos, destination):
+    """
+    Отмечает, что пары (лот, destination) сейчас уйдут в Telegram: после этого их нельзя
+    вернуть в pending без риска опубликовать дважды. Возвращает True при успехе.
+    """
+    if pool is None:
+        logger.error("Пул соединений с базой данных не инициализирован")
+        return False
     try:
-        with conn:
-            with conn.cursor() as cur:
-                query = '''
-                        UPDATE messages SET send_to_channel = TRUE WHERE id = %s
-                        '''
-                cur.execute(query, (message_id,))
+        await pool.execute(
+            '''
+            UPDATE lot_deliveries SET attempted_at = now()
+            WHERE message_id = $1 AND lot_no = ANY($2) AND destination = $3 AND attempted_at IS NULL
+            ''',
+            message_id, list(lot_nos), destination
+        )
+        return True
     except Exception as e:
         logger.error(f"Ошибка при выполнении запроса: {e}")
+        return False
+
+@timed_query("delivery_message_id")
+async def delivery_message_id(message_id, lot_no, destination):
+    """id опубликованного сообщения Telegram для пары (лот, канал) или None, если его нет."""
+    if pool is None:
+        return None
+    try:
+        return await pool.fetchval(
+            '''
+            SELECT tg_message_id FROM lot_deliveries
+            WHERE message_id = $1 AND lot_no = $2 AND destination = $3 AND status = 'sent'
+            ''',
+            message_id, lot_no, destination
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении запроса: {e}")
+        return None
+
+@timed_query("take_rate_token")
+async def take_rate_token(name, rate, capacity):
+    """
+    Забирает токен из общего bucket name в rate_buckets (создаёт его при первом обращении)
+    и возвращает, сколько секунд нужно подождать до своего слота, с учётом паузы flood control.
+    Возвращает None, если база недоступна.
+    """
+    if pool is None:
+        return None
+    try:
+        return await pool.fetchval(
+            '''
+            WITH seed AS (
+                INSERT INTO rate_buckets (name, tokens) VALUES ($1, $3)
+                ON CONFLICT (name) DO NOTHING
+            )
+            UPDATE rate_buckets
+            SET tokens = LEAST($3, tokens + EXTRACT(EPOCH FROM clock_timestamp() - updated_at) * $2) - 1,
+                updated_at = clock_timestamp()
+            WHERE name = $1
+            RETURNING GREATEST(
+                -tokens / $2,
+                EXTRACT(EPOCH FROM COALESCE(paused_until, clock_timestamp()) - clock_timestamp()),
+                0
+            )::float8
+            ''',
+            name, float(rate), float(capacity)
+        ) or 0.0
+    except Exception as e:
+        logger.error(f"Ошибка при обращении к общему лимиту {name}: {e}")
+        return None
+
+@timed_query("pause_rate_bucket")
+async def pause_rate_bucket(name, seconds):
+    """Ставит общий bucket name на паузу как минимум на seconds секунд для всех воркеров."""
+    if pool is None:
+        return False
+    try:
+        await pool.execute(
+            '''
+            UPDATE rate_buckets
+            SET paused_until = GREATEST(COALESCE(paused_until, now()), now() + make_interval(secs => $2)),
+                tokens = LEAST(tokens, 0)
+            WHERE name = $1
+            ''',
+            name, float(seconds)
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при обращении к общему лимиту {name}: {e}")
+        return False
+
+
+class AckBatcher:
+    """
+    Накапливает id обработанных записей и сбрасывает их в базу через mark_many_as_sent,
+    как только набралось max_size штук или прошло interval секунд.
+    Если запись в базу не удалась, id остаются в очереди до следующего сброса.
+    """
+
+    def __init__(self, max_size=ACK_BATCH_SIZE, interval=ACK_FLUSH_INTERVAL):
+        self.max_size = max_size
+        self.interval = interval
+        self._pending = []
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self._flushes = set()
+
+    def start(self):
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._run_timer())
+
+    async def _run_timer(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def add(self, message_id):
+        self._pending.append(message_id)
+        if len(self._pending) >= self.max_size:
+            task = asyncio.create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            if not await mark_many_as_sent(batch):
+                self._pending[:0] = batch
 
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.flush()
@@ -0,0 +1,97 @@
+import os
+import re
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Как публиковать объявление, в котором у канала больше DIGEST_THRESHOLD лотов:
+#   lots   — каждый лот отдельным сообщением (как раньше);
+#   digest — лоты упаковываются в как можно меньше сообщений-сводок;
+#   thread — одно сообщение-шапка, лоты публикуются ответами на него.
+SEND_MODE = os.getenv("SEND_MODE", "lots")
+DIGEST_THRESHOLD = int(os.getenv("DIGEST_THRESHOLD", "3"))
+# Предел длины сообщения Telegram
+DIGEST_LIMIT = int(os.getenv("DIGEST_LIMIT", "4096"))
+
+SEND_MODES = ("lots", "digest", "thread")
+if SEND_MODE not in SEND_MODES:
+    raise ValueError(f"Неверный SEND_MODE={SEND_MODE!r}, допустимо: {', '.join(SEND_MODES)}")
+
+# Номер "лота" шапки треда в журнале lot_deliveries: настоящие лоты нумеруются с 1
+HEADER_LOT_NO = 0
+
+TAG_RE = re.compile(r"<[^>]*>")
+
+
+def text_length(text):
+    """Длина в единицах UTF-16, как её считает Telegram (эмодзи — по две)."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _cut_plain(line, limit):
+    """Режет строку без тегов на куски не длиннее limit, не разрывая HTML-сущности вида &amp;."""
+    pieces = []
+    while text_length(line) > limit:
+        cut = limit
+        while text_length(line[:cut]) > limit:
+            cut -= 1
+        amp = line.rfind("&", 0, cut)
+        if amp != -1 and line.find(";", amp, cut) == -1:
+            cut = amp
+        pieces.append(line[:cut])
+        line = line[cut:]
+    pieces.append(line)
+    return pieces
+
+
+def split_html(text, limit):
+    """
+    Делит HTML-текст на куски не длиннее limit по границам строк: в шаблонах сообщений
+    каждый тег открывается и закрывается в одной строке, поэтому кусок всегда с целыми тегами.
+    Строку, которая сама длиннее limit, приходится резать: теги из неё убираются.
+    """
+    pieces = []
+    current = ""
+    for line in text.split("\n"):
+        if text_length(line) > limit:
+            line_pieces = _cut_plain(TAG_RE.sub("", line), limit)
+        else:
+            line_pieces = [line]
+        for piece in line_pieces:
+            candidate = f"{current}\n{piece}" if current else piece
+            if current and text_length(candidate) > limit:
+                pieces.append(current)
+                candidate = piece
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def build_digests(header, continuation, lots, limit=DIGEST_LIMIT):
+    """
+    Упаковывает лоты одного объявления в сводки не длиннее limit.
+    header и continuation — начало первой и следующих сводок, lots — [(номер лота, текст лота)]
+    (см. render.Announcement). Возвращает [(текст, [номера лотов, которые начинаются в этой сводке])];
+    лот целиком переносится в следующую сводку и режется, только если сам не влезает в одну.
+    """
+    # Кусок лота должен влезать в сводку вместе с любой из шапок
+    piece_limit = limit - max(text_length(header), text_length(continuation)) - 2
+    digests = []
+    seen = set()
+    parts, lot_nos, size = [header], [], text_length(header)
+    for lot_no, text in lots:
+        for piece in split_html(text, piece_limit):
+            length = text_length(piece) + 2
+            if len(parts) > 1 and size + length > limit:
+                digests.append(("\n\n".join(parts), lot_nos))
+                parts, lot_nos, size = [continuation], [], text_length(continuation)
+            parts.append(piece)
+            size += length
+            if lot_no not in seen:
+                seen.add(lot_no)
+                lot_nos.append(lot_no)
+    if len(parts) > 1:
+        digests.append(("\n\n".join(parts), lot_nos))
+    return digests
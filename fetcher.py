@@ -0,0 +1,96 @@
+import asyncio
+import os
+import random
+from typing import NamedTuple
+
+import aiohttp
+from dotenv import load_dotenv
+
+from logScript import logger
+from metrics import FETCH_RETRY_COUNT, FETCHES
+
+load_dotenv()
+
+# Сколько страниц ЕФРСБ качаем одновременно и сколько соединений держим на один хост
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "10"))
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "4"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "30"))
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "3"))
+FETCH_BACKOFF = float(os.getenv("FETCH_BACKOFF", "1.0"))
+# Раньше страницы забирались через requests.post, метод оставляем тем же по умолчанию
+FETCH_METHOD = os.getenv("FETCH_METHOD", "POST")
+
+# Ответы, после которых имеет смысл повторить запрос
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Page(NamedTuple):
+    """Ответ ЕФРСБ: тело в байтах, кодировка и валидаторы для кэша. На ответ 304 body и encoding — None."""
+    body: bytes
+    encoding: str
+    etag: str
+    last_modified: str
+
+
+def describe_error(e):
+    """Текст ошибки для лога: у таймаутов str(e) пустой, тогда выводим хотя бы тип."""
+    return str(e) or type(e).__name__
+
+
+def create_session():
+    """
+    Создаёт общую aiohttp-сессию с пулом keep-alive соединений.
+    Сессию нужно закрыть после использования (async with create_session() as session).
+    """
+    connector = aiohttp.TCPConnector(
+        limit=FETCH_CONCURRENCY,
+        limit_per_host=FETCH_PER_HOST,
+        keepalive_timeout=60
+    )
+    timeout = aiohttp.ClientTimeout(total=FETCH_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def fetch_page(session, link, cached=None):
+    """
+    Скачивает страницу сообщения и возвращает Page.
+    Раскодирование оставлено разбору, чтобы оно шло в процессах разбора, а не в цикле событий.
+    cached — запись pagecache с ETag/Last-Modified: для GET-запроса они уходят в If-None-Match
+    и If-Modified-Since, и на ответ 304 возвращается Page без тела. POST условным не бывает,
+    там неизменность страницы проверяется по хешу тела.
+    Сетевые ошибки, таймауты и ответы из RETRY_STATUSES повторяются
+    с экспоненциальной задержкой, после FETCH_RETRIES попыток ошибка пробрасывается.
+    """
+    headers = {}
+    if cached is not None and FETCH_METHOD.upper() == "GET":
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+    for attempt in range(1, FETCH_RETRIES + 1):
+        try:
+            async with session.request(FETCH_METHOD, link, headers=headers) as response:
+                if response.status not in RETRY_STATUSES or attempt == FETCH_RETRIES:
+                    response.raise_for_status()
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+                    if response.status == 304 and headers:
+                        FETCHES.labels(result="not_modified").inc()
+                        return Page(None, None, etag or cached.etag, last_modified or cached.last_modified)
+                    body = await response.read()
+                    FETCHES.labels(result="ok").inc()
+                    return Page(body, response.get_encoding(), etag, last_modified)
+                error = f"HTTP {response.status}"
+        except aiohttp.ClientResponseError:
+            # Остальные ошибки HTTP (404 и т.п.) повторять бессмысленно
+            FETCHES.labels(result="error").inc()
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt == FETCH_RETRIES:
+                FETCHES.labels(result="error").inc()
+                raise
+            error = describe_error(e)
+        delay = FETCH_BACKOFF * 2 ** (attempt - 1) + random.uniform(0, FETCH_BACKOFF)
+        FETCH_RETRY_COUNT.inc()
+        logger.warning(f"Ошибка загрузки {link} (попытка {attempt}/{FETCH_RETRIES}): {error}, повтор через {delay:.1f} с")
+        await asyncio.sleep(delay)
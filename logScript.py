@@ -10,17 +10,18 @@ os.makedirs(log_dir, exist_ok=True)
 info_log_file = os.path.join(log_dir, "info.log")
 error_log_file = os.path.join(log_dir, "error.log")
 
-# Настройка логгера
+# Настройка логгера. Уровень задаётся LOG_LEVEL (DEBUG, INFO, WARNING...); отладочные дампы
+# в горячем пути проверяют logger.isEnabledFor(logging.DEBUG) и при INFO ничего не стоят
 logger = logging.getLogger("MyLogger")
-logger.setLevel(logging.DEBUG)  # Устанавливаем минимальный уровень для логгера
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
 
 # Форматирование логов
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
-# Обработчик для INFO и DEBUG
+# Обработчик для INFO и DEBUG (что из них попадёт в лог, решает уровень логгера)
 info_handler = RotatingFileHandler(info_log_file, maxBytes=20 * 1024 * 1024, backupCount=100, encoding='utf-8')
 info_handler.setFormatter(formatter)
-info_handler.setLevel(logging.INFO)
+info_handler.setLevel(logging.DEBUG)
 
 # Обработчик для WARNING, ERROR, CRITICAL
 error_handler = RotatingFileHandler(error_log_file, maxBytes=20 * 1024 * 1024, backupCount=5, encoding='utf-8')
@@ -30,7 +31,7 @@ error_handler.setLevel(logging.WARNING)
 # Обработчик для консоли (по желанию)
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(formatter)
-console_handler.setLevel(logging.INFO)
+console_handler.setLevel(logging.DEBUG)
 
 # Добавляем обработчики к логгеру
 logger.addHandler(info_handler)
@@ -1,169 +1,467 @@
 import asyncio
-import datetime
+import logging
+import signal
+from functools import partial
 from logScript import logger
-import re
-from pprint import pprint
+from pprint import pformat
 
 from aiogram import Bot, Dispatcher, types
 from aiogram.client.default import DefaultBotProperties
-from aiogram.exceptions import TelegramBadRequest
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import CommandStart
+from aiogram.types import ReplyParameters
 from dotenv import load_dotenv
 import os
-import html
+import time
+import uuid
 
-from db import fetch_unsent_links, mark_as_sent
-from sender import link_parser
+from db import (
+    DELIVERY_FAILED, DELIVERY_PENDING, DELIVERY_SENT, DELIVERY_SKIPPED, LEASE_SECONDS, AckBatcher,
+    ack_completed_messages, close_db_pool, count_unsent, delivery_message_id, extend_leases,
+    fetch_unsent_links, init_db_pool, listen_new_messages, lock_worker, mark_attempted, mark_stale, record_delivery,
+    register_deliveries, release_leases, release_message, skip_stale_messages
+)
+from digest import DIGEST_THRESHOLD, HEADER_LOT_NO, SEND_MODE, build_digests
+from metrics import BACKLOG, LOTS, span, start_metrics_server
+from pagecache import close_page_cache
+from pipeline import run_pipeline, shutdown_parse_pool, warm_up_parse_pool
+from pubdate import current_window, in_window, is_published_in_window, parse_date
+from ratelimit import SharedTokenBucket
+from render import Announcement, format_for
+from routing import all_channels, resolve_destinations
+from scheduler import CANCELLED, DEFERRED, SENT, SendScheduler
 
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
-CHANNEL_ID = os.getenv("CHANNEL_ID")
+# Адрес Bot API: свой сервер telegram-bot-api или подставной из tools/bench.py; пусто — api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+# Режим LISTEN/NOTIFY: новые записи будят бота сразу, а опрос раз в FALLBACK_POLL_INTERVAL остаётся подстраховкой.
+# При DB_LISTEN=0 бот, как раньше, опрашивает базу каждые POLL_INTERVAL секунд.
+DB_LISTEN = os.getenv("DB_LISTEN", "1") == "1"
+POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", "60"))
+FALLBACK_POLL_INTERVAL = float(os.getenv("FALLBACK_POLL_INTERVAL", "300"))
+# Лимиты Telegram считаются в базе, чтобы несколько запущенных воркеров делили один бюджет
+SEND_SHARED_BUDGET = os.getenv("SEND_SHARED_BUDGET", "1") == "1"
+# Постоянное имя воркера (например, имя пода или сервиса). Процесс с тем же WORKER_ID ждёт, пока
+# предыдущий остановится, и сразу снимает оставшуюся после него аренду — даже если тот упал,
+# не дожидаясь LEASE_SECONDS. Без WORKER_ID у каждого запуска своя аренда.
+WORKER_ID = os.getenv("WORKER_ID", "").strip()
+# Сколько секунд после SIGTERM/SIGINT даётся на отправку уже взятого в работу
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "20"))
+# Идентификатор аренды этого процесса: им помечаются взятые в работу записи и пары (лот, канал)
+LEASE_ID = uuid.uuid5(uuid.NAMESPACE_URL, f"efrsb2tg:{WORKER_ID}") if WORKER_ID else uuid.uuid4()
 
-bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
+bot = Bot(
+    token=BOT_TOKEN,
+    session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None,
+    default=DefaultBotProperties(parse_mode="HTML")
+)
 dp = Dispatcher()
+acks = AckBatcher()
+# Взводится по SIGTERM/SIGINT: новые записи больше не берутся
+shutdown = asyncio.Event()
+# До какого момента (time.monotonic) после сигнала остановки дорабатывается взятое в работу
+shutdown_deadline = None
+# Задачи, которые ждут итогов отправки записи и пишут их в журнал lot_deliveries
+delivery_tasks = set()
+# Те из них, у записей которых часть лотов не поместилась в очередь канала (DEFERRED)
+postponed_tasks = set()
 
 @dp.message(CommandStart())
 async def start_command(message: types.Message):
     await message.answer(
         "👋 Привет! Я бот ЕФРСБ Монитор.\n"
-        "Я публикую объявления и оценки с ЕФРСБ в наш Telegram-канал.\n"
-        f"Подписывайтесь: {CHANNEL_ID}"
+        "Я публикую объявления и оценки с ЕФРСБ в наши Telegram-каналы.\n"
+        f"Подписывайтесь: {', '.join(all_channels())}"
     )
 
-def filter_messages_by_current_month(messages: list) -> list:
-    """
-    Принимает список сообщений (каждое сообщение — словарь, где ключ "Дата публикации" содержит дату в формате "%d.%m.%Y")
-    и возвращает только те, у которых год и месяц совпадают с текущим.
-    """
-    current_date = datetime.datetime.now()
-    filtered = []
-    for msg in messages:
-        pub_date_str = msg.get("Дата публикации", None)
-        if pub_date_str:
-            try:
-                pub_date = datetime.datetime.strptime(pub_date_str, "%d.%m.%Y")
-                if pub_date.year == current_date.year and pub_date.month == current_date.month:
-                    filtered.append(msg)
-            except Exception as e:
-                # Если не удается распарсить дату, можно пропустить сообщение или добавить его по умолчанию
-                continue
-    return filtered
-
-def build_message(data: dict) -> str:
-    # Извлечение первых 10–15 слов описания
-    description_words = data.get('Описание', 'Описание отсутствует').split()
-    short_description = ' '.join(description_words[:15]) + ('...' if len(description_words) > 15 else '')
+async def send_message_to_group(chat_id, message_text: str, reply_to=None):
+    """
+    Одна попытка отправить сообщение в группу или канал; reply_to — id сообщения, на которое отвечаем.
+    Ошибки не перехватываются: повторы, flood control и учёт неудач — в SendScheduler.
+    """
+    return await bot.send_message(
+        chat_id=chat_id,
+        text=message_text,
+        disable_web_page_preview=True,
+        reply_parameters=ReplyParameters(message_id=reply_to, allow_sending_without_reply=True) if reply_to else None
+    )
 
+scheduler = SendScheduler(send_message_to_group, bucket_factory=SharedTokenBucket if SEND_SHARED_BUDGET else None)
 
-    au_info = data.get('Арбитражный управляющий', '').strip()
-    if not au_info or au_info == 'Неизвестно':
-        au_info = data.get('Организатор торгов', 'Неизвестно').strip()
+async def track_delivery(message_id, lot_no, chat_id, future):
+    """
+    Дожидается отправки пары (лот, канал) и записывает результат в журнал.
+    Возвращает True, если итог удалось сохранить.
+    """
+    job = await future
+    if job.status in (CANCELLED, DEFERRED):
+        # Запроса к Telegram не было (бот остановлен, не записалась отметка о попытке или очередь
+        # канала заполнена): пара вернётся в pending (release_leases, release_message) и уйдёт при следующем проходе
+        return False
+    if job.status == SENT:
+        status = DELIVERY_SENT
+    else:
+        status = DELIVERY_FAILED
+        logger.error(f"Лот {lot_no} записи {message_id} не отправлен в {chat_id}: {job.error}")
+    return await record_delivery(message_id, lot_no, chat_id, status, job.message_id, job.attempts, job.error)
 
-    if au_info and au_info != 'Неизвестно':
-        fio_au = au_info.split(' (ИНН')[0] if ' (ИНН' in au_info else au_info
-        match = re.search(r'ИНН[:\s]*(\d+)', au_info)
-        if match:
-            inn = match.group(1)
-        else:
-            inn = 'Неизвестно'
+async def finish_message(message_id, deliveries):
+    """
+    Помечает запись обработанной, когда итоги всех её пар (лот, канал) сохранены в журнале.
+    Если какой-то итог записать не удалось, запись остаётся необработанной, с неё снимается
+    аренда, и при следующем проходе журнал подскажет, что ещё не отправлено.
+    """
+    results = await asyncio.gather(*deliveries)
+    if all(results):
+        acks.add(message_id)
     else:
-        fio_au = 'Неизвестно'
-        inn = 'Неизвестно'
-
-    message = (
-        f"#{html.escape(data.get('Классификация', 'Без категории'))}\n\n"
-        f"📅 <b>Дата публикации:</b> {html.escape(data.get('Дата публикации', 'Не указана'))}\n"
-        f"🏷️ <b>Формат торгов:</b> {html.escape(data.get('Вид торгов', 'Не указан'))}\n\n"
-        f"📝 <b>Описание:</b> {html.escape(short_description)}\n\n"
-        f"💰 <b>Цена:</b> {html.escape(data.get('Цена', 'Не указана'))}\n\n"
-        f"👨‍💼 <b>Арбитражный управляющий:</b>\n"
-        f"ФИО: {html.escape(fio_au)}\n"
-        f"ИНН: {html.escape(inn)}\n"
-        f"Телефон: отсутствует\n"
-        f"E-mail: {html.escape(data.get('E-mail', 'отсутствует'))}\n\n"
-        f"🏢 <b>Должник:</b>\n"
-        f"Наименование: {html.escape(data.get('ФИО должника', 'Не указано'))}\n"
-        f"ИНН: {html.escape(data.get('ИНН', 'Не указан'))}\n\n"
-        f"🔗 <a href=\"{html.escape(data.get('Ссылка', '#'))}\">Открыть сообщение</a>"
-    )
-    return message
+        await release_message(message_id, LEASE_ID)
+
+def deferred(message_id, chat_id, future):
+    """
+    True, если очередь канала заполнена и сообщение не принято (DEFERRED). Тогда остальные сообщения
+    записи в этот канал не ставятся: их пары остаются в журнале, запись освобождается (finish_message)
+    и дойдёт до канала при следующем проходе, а очереди других каналов не ждут медленный.
+    """
+    if not (isinstance(future, asyncio.Future) and future.done() and future.result().status == DEFERRED):
+        return False
+    logger.info(f"Очередь канала {chat_id} заполнена, лоты записи {message_id} отложены до следующего прохода")
+    return True
+
+def spawn_delivery_task(coro, postponed=False):
+    task = asyncio.create_task(coro)
+    delivery_tasks.add(task)
+    task.add_done_callback(delivery_tasks.discard)
+    if postponed:
+        postponed_tasks.add(task)
+        task.add_done_callback(postponed_tasks.discard)
 
+async def handle_failed(message_id, link):
+    """Запись не обработана из-за ошибки: снимаем с неё аренду, следующий проход попробует снова."""
+    await release_message(message_id, LEASE_ID)
 
-async def send_message_to_group(message_text: str):
+async def handle_stale(message_id, link, published):
+    """Сообщение опубликовано вне окна PUBLICATION_WINDOW: запись закрывается окончательно, без журнала."""
+    logger.info(f"Запись {message_id} ({link}) опубликована {published:%d.%m.%Y}, вне окна публикации — пропущена")
+    await mark_stale(message_id, published)
+
+async def handle_parsed(message_id, link, messages):
     """
-    Отправляет сообщение в группу или канал.
-    Используется CHANNEL_ID из переменных окружения.
+    Заносит лоты одной разобранной страницы в журнал lot_deliveries и ставит в очереди отправки
+    каналов (routing по классификации) только пары, которые этот воркер забрал в отправку.
+    Лоты вне окна дат публикации записываются как skipped. Запись помечается обработанной,
+    когда у всех её пар окончательный статус.
     """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Лоты записи {message_id}:\n{pformat(messages)}")
+    window = current_window()
+    # У всех лотов страницы общая шапка с датой публикации
+    published = parse_date(messages[0].get('Дата публикации')) if messages else None
+    if published is not None and not in_window(published, window):
+        # Лоты могли прийти из кэша страниц, разобранные ещё до того, как окно сдвинулось
+        await handle_stale(message_id, link, published)
+        return
+    deliveries = []
+    # Номер лота — его позиция на странице, начиная с 1
+    for lot_no, msg in enumerate(messages, start=1):
+        status = DELIVERY_PENDING if is_published_in_window(msg, window) else DELIVERY_SKIPPED
+        for chat_id in resolve_destinations(msg.get('Классификация')):
+            deliveries.append((lot_no, chat_id, status))
+
+    if not messages:
+        # На странице нет лотов: запись больше не нужно перечитывать
+        acks.add(message_id)
+        return
+    if not deliveries:
+        logger.error(f"Для записи {message_id} не настроено ни одного канала")
+        await handle_failed(message_id, link)
+        return
+
+    # Каналы, где лотов объявления больше порога, получают сводки или тред (SEND_MODE).
+    # Решение зависит только от страницы, поэтому повторный проход примет такое же.
+    lots_per_chat = {}
+    for lot_no, chat_id, status in deliveries:
+        if status == DELIVERY_PENDING:
+            lots_per_chat[chat_id] = lots_per_chat.get(chat_id, 0) + 1
+    batched = {} if SEND_MODE == "lots" else {
+        chat_id: count for chat_id, count in lots_per_chat.items() if count > DIGEST_THRESHOLD
+    }
+    for lot_no, chat_id, status in deliveries:
+        LOTS.labels(status=status).inc()
+    if SEND_MODE == "thread":
+        # Шапка треда учитывается в журнале как пара с номером лота HEADER_LOT_NO
+        deliveries += [(HEADER_LOT_NO, chat_id, DELIVERY_PENDING) for chat_id in batched]
+
+    claimed = await register_deliveries(message_id, deliveries, LEASE_ID, published)
+    if claimed is None:
+        logger.error(f"Не удалось записать журнал доставки записи {message_id}, отправка отложена")
+        await handle_failed(message_id, link)
+        return
+
+    # Уже отправленные, пропущенные и взятые другим воркером пары не трогаем
+    claimed_lots = {}
+    for lot_no, chat_id, _ in deliveries:
+        if (lot_no, chat_id) in claimed and lot_no != HEADER_LOT_NO:
+            claimed_lots.setdefault(chat_id, []).append(lot_no)
+
+    pending = []
+    postponed = False
+    # Шапка экранируется один раз на объявление, тексты лотов — один раз на формат
+    announcement = Announcement(messages)
     try:
-        await bot.send_message(
-            chat_id=CHANNEL_ID,
-            text=message_text,
-            disable_web_page_preview=True
+        for chat_id, lot_nos in claimed_lots.items():
+            message_format = format_for(chat_id)
+            if chat_id in batched and SEND_MODE == "digest":
+                postponed |= await submit_digests(
+                    message_id, chat_id, announcement, message_format, lot_nos, batched[chat_id], pending
+                )
+                continue
+            reply_to = None
+            if chat_id in batched and SEND_MODE == "thread":
+                reply_to = await submit_thread_header(
+                    message_id, chat_id, announcement, message_format, claimed, batched[chat_id], pending
+                )
+                if deferred(message_id, chat_id, reply_to):
+                    postponed = True
+                    continue
+            for lot_no in lot_nos:
+                standalone = partial(announcement.message, lot_no, message_format)
+                with span("build", message_id=message_id, lot_no=lot_no):
+                    if reply_to is not None:
+                        text = announcement.lot(lot_no, message_format)
+                    else:
+                        text = standalone()
+                future = await scheduler.submit(
+                    chat_id, text, reply_to, before_send=partial(mark_attempted, message_id, [lot_no], chat_id),
+                    # Если шапка треда не ушла, лот публикуется полным сообщением, а не ответом без шапки
+                    standalone=standalone, wait=False
+                )
+                pending.append(track_delivery(message_id, lot_no, chat_id, future))
+                if deferred(message_id, chat_id, future):
+                    postponed = True
+                    break
+    finally:
+        # Если проход прерван остановкой, итоги уже поставленных в очередь сообщений всё равно
+        # записываются: отправленное не должно остаться в журнале неотправленным
+        spawn_delivery_task(finish_message(message_id, pending), postponed)
+
+async def submit_digests(message_id, chat_id, announcement, message_format, lot_nos, lots_total, pending):
+    """
+    Ставит в очередь канала сводки лотов lot_nos; каждый лот получает итог своей сводки
+    (ожидания итогов добавляются в pending). Возвращает True, если очередь канала заполнилась.
+    """
+    with span("build", message_id=message_id, chat_id=chat_id):
+        digests = build_digests(
+            announcement.header(lots_total, message_format),
+            announcement.continuation(message_format),
+            [(lot_no, announcement.lot(lot_no, message_format)) for lot_no in lot_nos]
+        )
+    for text, digest_lots in digests:
+        future = await scheduler.submit(
+            chat_id, text, before_send=partial(mark_attempted, message_id, digest_lots, chat_id), wait=False
+        )
+        pending.extend(track_delivery(message_id, lot_no, chat_id, future) for lot_no in digest_lots)
+        if deferred(message_id, chat_id, future):
+            return True
+    return False
+
+async def submit_thread_header(message_id, chat_id, announcement, message_format, claimed, lots_total, pending):
+    """
+    Возвращает, на что отвечать лотами в треде: future шапки, если её отправляет этот воркер
+    (её итог добавляется в pending), или id уже опубликованной шапки из журнала.
+    Если шапки нет, лоты уходят обычными сообщениями.
+    """
+    if (HEADER_LOT_NO, chat_id) in claimed:
+        future = await scheduler.submit(
+            chat_id, announcement.header(lots_total, message_format),
+            before_send=partial(mark_attempted, message_id, [HEADER_LOT_NO], chat_id), wait=False
         )
-        print("Сообщение успешно отправлено!")
-    except TelegramBadRequest as e:
-        error_msg = str(e)
-        if "Too Many Requests" in error_msg and "retry after" in error_msg:
-            # Ищем число секунд, которое нужно ждать
-            m = re.search(r"retry after (\d+)", error_msg)
-            if m:
-                retry_after = int(m.group(1))
-            else:
-                retry_after = 10  # значение по умолчанию
-            logger.error(f"Flood control: ждем {retry_after} секунд перед повторной отправкой")
-            await asyncio.sleep(retry_after)
-            # Повторяем отправку
-            await send_message_to_group(message_text)
-        else:
-            logger.error(f"Ошибка при отправке сообщения: {e}")
-
-    except Exception as e:
-        print(f"Ошибка при отправке сообщения: {e}")
+        pending.append(track_delivery(message_id, HEADER_LOT_NO, chat_id, future))
+        return future
+    return await delivery_message_id(message_id, HEADER_LOT_NO, chat_id)
 
 async def process_unsent_links():
     """
-    Получает данные из базы, парсит страницу по ссылке и отправляет каждый лот отдельным сообщением.
-    После успешной отправки помечает запись как обработанную.
+    Получает данные из базы, параллельно загружает и парсит страницы по ссылкам
+    и ставит лоты в очереди отправки каналов. Очереди отправляются в фоне, проход их не ждёт:
+    запись помечается обработанной, когда отправлены все её лоты (finish_message).
     """
-    # Получаем генератор записей (каждая запись: (message_id, ссылка))
-    unsent_generator = fetch_unsent_links(batch_size=100)
-    if unsent_generator is None:
+    if await init_db_pool() is None:
         logger.error("Не удалось получить данные из базы.")
         return
 
-    for record in unsent_generator:
-        message_id, link = record
-        logger.info(f'обработка: {message_id}, {link}')
-        try:
-            messages = link_parser(link)
-            messages = filter_messages_by_current_month(messages)
-            pprint(messages)
-            logger.info('\n\n\n')
-            if messages:
-                for msg  in messages:
-                    message_text = build_message(msg)
-                    await send_message_to_group(message_text)
-                    # Добавляем небольшую задержку между отправками
-                    await asyncio.sleep(1.5)
-            # Если сообщение успешно обработано, помечаем его как отправленное
-                mark_as_sent(message_id)
-        except Exception as e:
-            logger.error(f"Ошибка обработки записи {message_id} с ссылкой {link}: {e}")
+    # Записи, у которых всё уже отправлено, но подтверждение потерялось при остановке
+    completed = await ack_completed_messages()
+    if completed:
+        logger.info(f"Подтверждено записей, отправленных до перезапуска: {completed}")
 
-async def main():
+    backlog = await count_unsent()
+    if backlog is not None:
+        BACKLOG.set(backlog)
+
+    # Записи с уже известной датой вне окна закрываются в базе, не доходя до загрузки
+    window = current_window()
+    skipped = await skip_stale_messages(window)
+    if skipped:
+        logger.info(f"Пропущено записей вне окна публикации: {skipped}")
+
+    # Получаем генератор записей (каждая запись: (message_id, ссылка))
+    unsent_generator = fetch_unsent_links(LEASE_ID, window)
+    await run_pipeline(unsent_generator, handle_parsed, handle_stale, window, shutdown, handle_failed)
+    await acks.flush()
+
+async def finish_sending():
+    """Дожидается, пока каналы отправят всё поставленное в очереди, а итоги попадут в журнал и базу."""
+    await scheduler.join()
+    if delivery_tasks:
+        await asyncio.gather(*delivery_tasks)
+    await acks.flush()
+
+async def renew_leases():
+    """Продлевает аренду взятых этим процессом записей, пока он работает."""
     while True:
-        try:
-            await process_unsent_links()
-        except Exception as e:
-            logger.error(f"Ошибка в основном цикле: {e}")
-        # Ждём 60 секунд перед следующей проверкой
-        await asyncio.sleep(60)
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        await extend_leases(LEASE_ID)
+
+def request_shutdown(main_task):
+    """Первый сигнал — мягкая остановка, повторный — немедленная."""
+    global shutdown_deadline
+    if shutdown.is_set():
+        logger.warning("Повторный сигнал остановки: прерываем отправку")
+        shutdown_deadline = time.monotonic()
+        main_task.cancel()
+        return
+    logger.info(f"Получен сигнал остановки: дорабатываем взятое в работу, не дольше {SHUTDOWN_TIMEOUT:g} с")
+    shutdown_deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    shutdown.set()
 
+def shutdown_time_left():
+    """Сколько секунд ещё можно дорабатывать взятое в работу после сигнала остановки."""
+    if shutdown_deadline is None:
+        return 0
+    return max(0, shutdown_deadline - time.monotonic())
 
-if __name__ == "__main__":
+async def run_pass():
+    """
+    Один проход process_unsent_links. После сигнала остановки проход перестаёт брать записи
+    и дорабатывает уже взятое, пока не истечёт SHUTDOWN_TIMEOUT; что не успело, отменяется
+    и после release_leases достанется следующему процессу.
+    """
+    task = asyncio.create_task(process_unsent_links())
+    stopping = asyncio.create_task(shutdown.wait())
+    try:
+        await asyncio.wait({task, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        if not task.done():
+            await asyncio.wait({task}, timeout=shutdown_time_left())
+        if not task.done():
+            logger.warning(f"За {SHUTDOWN_TIMEOUT:g} с отправлено не всё: остаток вернётся в очередь")
+            task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Ошибка в основном цикле: {task.exception()}")
+    finally:
+        stopping.cancel()
+        task.cancel()
+
+async def wait_for_work(wakeup, interval):
+    """
+    Ждёт оповещения о новых записях, сигнала остановки или истечения интервала опроса.
+    Если в проходе очередь какого-то канала была заполнена, следующий проход начинается,
+    как только отложенные записи можно забрать снова (wait_postponed).
+    """
+    waiters = [asyncio.create_task(wakeup.wait()), asyncio.create_task(shutdown.wait())]
+    if scheduler.deferred_chats or postponed_tasks:
+        waiters.append(asyncio.create_task(wait_postponed()))
     try:
-        asyncio.run(main())
+        await asyncio.wait(waiters, timeout=interval, return_when=asyncio.FIRST_COMPLETED)
     finally:
+        for waiter in waiters:
+            waiter.cancel()
+
+async def wait_postponed():
+    """
+    Ждёт, пока опустеют заполненные в проходе очереди каналов, а записи с отложенными лотами
+    освободятся (finish_message): следующий проход заберёт их снова. Очереди остальных каналов не ждём.
+    """
+    await scheduler.wait_deferred()
+    if postponed_tasks:
+        await asyncio.wait(set(postponed_tasks))
+
+async def drain_queues():
+    """После сигнала остановки ждёт, пока опустеют очереди каналов, но не дольше оставшегося SHUTDOWN_TIMEOUT."""
+    if not shutdown.is_set():
+        return
+    drained = asyncio.create_task(scheduler.join())
+    try:
+        await asyncio.wait({drained}, timeout=shutdown_time_left())
+    except asyncio.CancelledError:
+        # Повторный сигнал: очередей больше не ждём
+        pass
+    if not drained.done():
+        drained.cancel()
+        logger.warning(f"За {SHUTDOWN_TIMEOUT:g} с очереди каналов не отправлены: остаток вернётся в очередь")
+
+async def main():
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, request_shutdown, asyncio.current_task())
+        except NotImplementedError:
+            # Windows: обработчиков сигналов в цикле событий нет, Ctrl+C прерывает как раньше
+            pass
+    # Миграции накатываются вместе с созданием пула; если база недоступна, это повторится на проходе
+    await init_db_pool()
+    await warm_up_parse_pool()
+    # Блокировка WORKER_ID: пока предыдущий процесс дорабатывает, этот ждёт
+    worker_lock = await lock_worker(WORKER_ID, shutdown) if WORKER_ID else None
+    if worker_lock is not None:
+        # Если предыдущий процесс упал, его записи и неотправленные лоты ещё в аренде
+        released = await release_leases(LEASE_ID)
+        if released is not None and any(released):
+            logger.info(f"Подхвачено после предыдущего процесса записей: {released[0]}, лотов: {released[1]}")
+    acks.start()
+    metrics_server = await start_metrics_server()
+    heartbeat = asyncio.create_task(renew_leases())
+    wakeup = asyncio.Event()
+    listener = asyncio.create_task(listen_new_messages(wakeup)) if DB_LISTEN else None
+    interval = FALLBACK_POLL_INTERVAL if DB_LISTEN else POLL_INTERVAL
+    try:
+        while not shutdown.is_set():
+            # Сбрасываем до обработки: оповещения, пришедшие во время прохода, запустят следующий
+            wakeup.clear()
+            await run_pass()
+            if not shutdown.is_set():
+                await wait_for_work(wakeup, interval)
+    finally:
+        if listener is not None:
+            listener.cancel()
+        # Проходы не ждут очередей каналов: поставленное в них отправляется, пока не истечёт SHUTDOWN_TIMEOUT
+        await drain_queues()
+        # Недоотправленное получает статус CANCELLED, уже ушедшее в Telegram — свой итог в журнале
+        await scheduler.abort()
+        if delivery_tasks:
+            await asyncio.gather(*delivery_tasks, return_exceptions=True)
+        await acks.close()
+        heartbeat.cancel()
+        # Без блокировки WORKER_ID аренда с этим LEASE_ID принадлежит другому, ещё живому процессу
+        if worker_lock is not None or not WORKER_ID:
+            released = await release_leases(LEASE_ID)
+            if released is not None and any(released):
+                logger.info(f"Освобождено записей: {released[0]}, неотправленных лотов: {released[1]}")
+        if worker_lock is not None:
+            await worker_lock.close()
+        await close_db_pool()
+        shutdown_parse_pool()
+        close_page_cache()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
         # Закрываем сессию бота при завершении работы
-        asyncio.run(bot.close())
+        await bot.session.close()
+        logger.info("Бот остановлен")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,234 @@
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from logScript import logger
+
+load_dotenv()
+
+# Порт HTTP-эндпоинта /metrics в формате Prometheus; 0 — не поднимать
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+
+# Границы гистограмм по умолчанию (секунды), как в клиентах Prometheus
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Все метрики процесса в порядке объявления; render() выводит их в текстовом формате Prometheus
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        REGISTRY.append(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _default(self):
+        # Метрика без меток ведёт себя как её единственный потомок
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines += child.samples(self.name, self.labelnames, key)
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, labelnames, key):
+        return [f"{name}{_labels_text(labelnames, key)} {_number(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        # Последняя граница — +Inf, поэтому подходящая граница найдётся всегда
+        self.counts[bisect_left(self.buckets, value)] += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self, name, labelnames, key):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels_text(labelnames, key, [('le', _number(bound))])} {cumulative}")
+        labels = _labels_text(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_number(self.sum)}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets)) + (float("inf"),)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# Метрики бота. Стадии конвейера: fetch, parse, handle, build, send.
+STAGE_SECONDS = Histogram("efrsb_stage_seconds", "Время стадии обработки, с", ["stage"])
+DB_SECONDS = Histogram("efrsb_db_query_seconds", "Время запроса к Postgres, с", ["query"])
+FETCHES = Counter("efrsb_fetch_total", "Загрузки страниц ЕФРСБ по итогу", ["result"])
+FETCH_RETRY_COUNT = Counter("efrsb_fetch_retries_total", "Повторные попытки загрузки страниц")
+PAGE_CACHE = Counter("efrsb_page_cache_total", "Обращения к кэшу страниц по итогу", ["result"])
+PAGES = Counter("efrsb_pages_total", "Разобранные страницы по итогу", ["result"])
+LOTS_PER_PAGE = Histogram(
+    "efrsb_lots_per_page", "Лотов на странице", buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+LOTS = Counter("efrsb_lots_total", "Пары (лот, канал) по статусу при регистрации", ["status"])
+SENDS = Counter("efrsb_send_total", "Попытки отправки в Telegram по итогу", ["result"])
+SEND_QUEUE_SECONDS = Histogram(
+    "efrsb_send_queue_seconds", "Ожидание сообщения в очереди канала до первой попытки, с",
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+)
+FLOOD_WAIT_SECONDS = Counter("efrsb_flood_wait_seconds_total", "Суммарная пауза по flood control Telegram, с")
+BACKLOG = Gauge("efrsb_backlog_messages", "Неотправленных записей в messages в начале прохода")
+ACKS = Counter("efrsb_acked_messages_total", "Записи, помеченные обработанными")
+
+
+@contextmanager
+def span(stage, **context):
+    """
+    Замеряет стадию обработки в efrsb_stage_seconds{stage}.
+    При LOG_LEVEL=DEBUG каждый замер ещё и пишется в лог вместе с context (message_id, ссылка и т.п.).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+        if logger.isEnabledFor(logging.DEBUG):
+            details = " ".join(f"{key}={value}" for key, value in context.items())
+            logger.debug(f"span {stage} {elapsed * 1000:.1f} мс {details}")
+
+
+def timed_query(query):
+    """Декоратор для функций db.py: время вызова попадает в efrsb_db_query_seconds{query}."""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with DB_SECONDS.labels(query=query).time():
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def _handle_metrics(request):
+    return web.Response(body=render().encode("utf-8"),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Поднимает GET /metrics; возвращает AppRunner (его нужно закрыть через cleanup()) или None."""
+    if not port:
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.error(f"Не удалось поднять /metrics на {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
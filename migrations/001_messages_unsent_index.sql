@@ -0,0 +1,6 @@
+-- Частичный индекс под выборку неотправленных сообщений в db.fetch_unsent_links.
+-- Условие должно дословно совпадать с WHERE запроса, иначе планировщик индекс не возьмёт.
+CREATE INDEX IF NOT EXISTS messages_unsent_id_idx
+    ON messages (id)
+    WHERE send_to_channel = FALSE
+      AND тип_сообщения IN ('Аукцион', 'Публичка', 'Отчет оценщика');
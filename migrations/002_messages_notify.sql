@@ -0,0 +1,17 @@
+-- Оповещение слушателя db.listen_new_messages о новых неотправленных сообщениях.
+-- Payload пустой: одинаковые NOTIFY в одной транзакции Postgres схлопывает в одно,
+-- поэтому массовая вставка будит бота один раз.
+CREATE OR REPLACE FUNCTION notify_messages_new() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('messages_new', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS messages_notify_new ON messages;
+CREATE TRIGGER messages_notify_new
+    AFTER INSERT OR UPDATE OF send_to_channel ON messages
+    FOR EACH ROW
+    WHEN (NEW.send_to_channel = FALSE
+          AND NEW.тип_сообщения IN ('Аукцион', 'Публичка', 'Отчет оценщика'))
+    EXECUTE FUNCTION notify_messages_new();
@@ -0,0 +1,15 @@
+-- Журнал доставки: одна строка на пару (лот, канал) каждого сообщения из messages.
+-- pending — ещё не отправлен, sent — опубликован (tg_message_id), skipped — не подходит по дате,
+-- failed — не ушёл после всех попыток. Всё, кроме pending, окончательно и повторно не отправляется.
+CREATE TABLE IF NOT EXISTS lot_deliveries (
+    message_id    BIGINT      NOT NULL,
+    lot_no        INTEGER     NOT NULL,
+    destination   TEXT        NOT NULL,
+    status        TEXT        NOT NULL DEFAULT 'pending'
+                  CHECK (status IN ('pending', 'sent', 'skipped', 'failed')),
+    tg_message_id BIGINT,
+    attempts      INTEGER     NOT NULL DEFAULT 0,
+    error         TEXT,
+    updated_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (message_id, lot_no, destination)
+);
@@ -0,0 +1,24 @@
+-- Аренда записей для нескольких воркеров (db.fetch_unsent_links).
+-- Воркер забирает пачку через FOR UPDATE SKIP LOCKED и ставит свой lease_id со сроком;
+-- пока воркер жив, он продлевает срок (db.extend_leases), после падения записи снова свободны.
+ALTER TABLE messages
+    ADD COLUMN IF NOT EXISTS lease_id UUID,
+    ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+
+-- Пара (лот, канал), взятая воркером в отправку, получает статус sending и аренду.
+ALTER TABLE lot_deliveries
+    ADD COLUMN IF NOT EXISTS lease_id UUID,
+    ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+
+ALTER TABLE lot_deliveries DROP CONSTRAINT IF EXISTS lot_deliveries_status_check;
+ALTER TABLE lot_deliveries ADD CONSTRAINT lot_deliveries_status_check
+    CHECK (status IN ('pending', 'sending', 'sent', 'skipped', 'failed'));
+
+-- Общий для всех воркеров бюджет отправки в Telegram (ratelimit.SharedTokenBucket).
+-- tokens может уходить в минус: это уже выданные, но ещё не наступившие слоты.
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    name         TEXT             PRIMARY KEY,
+    tokens       DOUBLE PRECISION NOT NULL,
+    updated_at   TIMESTAMPTZ      NOT NULL DEFAULT clock_timestamp(),
+    paused_until TIMESTAMPTZ
+);
@@ -0,0 +1,9 @@
+-- Дата публикации сообщения и окончательный пропуск по окну дат (pubdate.PUBLICATION_WINDOW).
+-- publication_date заполняет бот из шапки страницы (или сразу тот, кто вставляет запись):
+-- по ней db.fetch_unsent_links не забирает, а db.skip_stale_messages закрывает старые записи без загрузки.
+-- Сейчас записи вставляются без даты, поэтому это работает только для уже загружавшихся страниц:
+-- бэклог при первом проходе скачивается целиком, по одному разу на запись, а экономится лишь разбор.
+-- Закрытая по дате запись получает send_to_channel = TRUE и skip_reason = 'stale' и больше не выбирается.
+ALTER TABLE messages
+    ADD COLUMN IF NOT EXISTS publication_date DATE,
+    ADD COLUMN IF NOT EXISTS skip_reason TEXT;
@@ -0,0 +1,7 @@
+-- Отметка о попытке отправки пары (лот, канал): ставится прямо перед запросом к Telegram.
+-- Пара в статусе sending без attempted_at точно ещё не публиковалась: при остановке бота
+-- и при запуске процесса с тем же WORKER_ID после падения она сразу возвращается в pending
+-- (db.release_leases). Пару с attempted_at Telegram мог успеть опубликовать, поэтому её,
+-- как и раньше, повторяют только после истечения аренды.
+ALTER TABLE lot_deliveries
+    ADD COLUMN IF NOT EXISTS attempted_at TIMESTAMPTZ;
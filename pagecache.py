@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from classifier import CATEGORIES_FILE
+from logScript import logger
+
+load_dotenv()
+
+# Каталог кэша страниц ЕФРСБ; пустая строка отключает кэш
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", "cache")
+# Предельный размер кэша: при превышении вытесняются давно не запрашивавшиеся страницы (LRU)
+PAGE_CACHE_MAX_MB = float(os.getenv("PAGE_CACHE_MAX_MB", "256"))
+# Сколько секунд страница считается свежей и берётся из кэша без запроса к ЕФРСБ.
+# После этого она перепроверяется: условным GET или сравнением хеша тела.
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "3600"))
+
+# Исходники, от которых зависит результат разбора: если они изменились, сохранённые лоты
+# не используются и страница разбирается заново из сохранённого тела
+_PARSER_SOURCES = [Path(__file__).resolve().parent / name for name in ("sender.py", "classifier.py")]
+
+
+def digest(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+class CachedPage:
+    """Сохранённая страница: тело, валидаторы и лоты, если они разобраны текущей версией разбора."""
+
+    def __init__(self, row, parser, ttl):
+        self.fresh = time.time() - row["fetched_at"] < ttl
+        self.digest = row["digest"]
+        self.etag = row["etag"]
+        self.last_modified = row["last_modified"]
+        self.encoding = row["encoding"]
+        self.fetched_at = row["fetched_at"]
+        self._body = row["body"]
+        # Список Lot или None, если страницу нужно разобрать заново; распаковывается сразу,
+        # пока запись читается в потоке, а не в цикле событий
+        self.lots = pickle.loads(zlib.decompress(row["lots"])) if row["parser"] == parser else None
+
+    @property
+    def body(self):
+        return zlib.decompress(self._body)
+
+
+class PageCache:
+    """
+    Кэш загруженных страниц и результатов их разбора в SQLite-файле по ссылке.
+    Методы синхронные и вызываются из потоков (см. lookup/revalidated/store);
+    несколько процессов бота на одной машине могут делить один файл.
+    """
+
+    def __init__(self, path, max_bytes, ttl):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                encoding TEXT,
+                body BLOB NOT NULL,
+                parser TEXT,
+                lots BLOB,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+            '''
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_used_at ON pages (used_at)")
+        self._size = self._db.execute("SELECT coalesce(sum(size), 0) FROM pages").fetchone()[0]
+        self._sources = hashlib.sha256(b"".join(path.read_bytes() for path in _PARSER_SOURCES)).hexdigest()
+        self._categories = None
+        self._parser = None
+
+    def parser_version(self):
+        """Отпечаток разбора: исходники sender/classifier и текущий словарь категорий."""
+        try:
+            stat = CATEGORIES_FILE.stat()
+            categories = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            categories = None
+        if categories != self._categories or self._parser is None:
+            self._categories = categories
+            self._parser = f"{self._sources[:16]}:{categories}"
+        return self._parser
+
+    def get(self, url):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE pages SET used_at = ? WHERE url = ?", (time.time(), url))
+        return CachedPage(row, self.parser_version(), self.ttl)
+
+    def touch(self, url, etag=None, last_modified=None):
+        """Страница перепроверена и не изменилась: снова свежая на PAGE_CACHE_TTL."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                '''
+                UPDATE pages SET fetched_at = ?, used_at = ?,
+                    etag = coalesce(?, etag), last_modified = coalesce(?, last_modified)
+                WHERE url = ?
+                ''',
+                (now, now, etag, last_modified, url)
+            )
+
+    def put(self, url, body, encoding, etag, last_modified, lots, fetched_at=None):
+        body_blob = zlib.compress(body)
+        lots_blob = zlib.compress(pickle.dumps(lots, protocol=pickle.HIGHEST_PROTOCOL))
+        size = len(body_blob) + len(lots_blob)
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                '''
+                INSERT OR REPLACE INTO pages
+                    (url, digest, etag, last_modified, encoding, body, parser, lots, size, fetched_at, used_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (url, digest(body), etag, last_modified, encoding, body_blob,
+                 self.parser_version(), lots_blob, size, fetched_at or now, now)
+            )
+            self._size += size - (old["size"] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Оставляем самые недавно запрошенные страницы, пока они занимают не больше 90% предела
+        self._db.execute(
+            '''
+            DELETE FROM pages WHERE url IN (
+                SELECT url FROM (
+                    SELECT url, sum(size) OVER (ORDER BY used_at DESC, url) AS kept FROM pages
+                ) WHERE kept > ?
+            )
+            ''',
+            (self.max_bytes * 0.9,)
+        )
+        self._size = self._db.execute("SELECT coalesce(sum(size), 0) FROM pages").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # Асинхронные обёртки для конвейера: SQLite, сжатие и pickle уходят в поток,
+    # а ошибки кэша только пишутся в лог — без кэша бот просто работает как раньше.
+
+    async def lookup(self, url):
+        try:
+            return await asyncio.to_thread(self.get, url)
+        except Exception as e:
+            logger.warning(f"Ошибка чтения кэша страниц для {url}: {e}")
+            return None
+
+    async def revalidated(self, url, page):
+        try:
+            await asyncio.to_thread(self.touch, url, page.etag, page.last_modified)
+        except Exception as e:
+            logger.warning(f"Ошибка обновления кэша страниц для {url}: {e}")
+
+    async def store(self, url, page, lots, fetched_at=None):
+        try:
+            await asyncio.to_thread(
+                self.put, url, page.body, page.encoding, page.etag, page.last_modified, lots, fetched_at
+            )
+        except Exception as e:
+            logger.warning(f"Ошибка записи кэша страниц для {url}: {e}")
+
+
+_cache = None
+
+
+def get_page_cache():
+    """Общий кэш страниц в PAGE_CACHE_DIR или None, если кэш отключён или не открылся."""
+    global _cache
+    if _cache is None and PAGE_CACHE_DIR:
+        try:
+            _cache = PageCache(Path(PAGE_CACHE_DIR) / "pages.sqlite3", PAGE_CACHE_MAX_MB * 1024 * 1024, PAGE_CACHE_TTL)
+        except Exception as e:
+            logger.error(f"Не удалось открыть кэш страниц в {PAGE_CACHE_DIR}: {e}")
+    return _cache
+
+
+def close_page_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
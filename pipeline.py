@@ -0,0 +1,224 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from multiprocessing.connection import wait
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+from fetcher import FETCH_CONCURRENCY, Page, create_session, describe_error, fetch_page
+from logScript import logger
+from metrics import LOTS_PER_PAGE, PAGE_CACHE, PAGES, span
+from pagecache import digest, get_page_cache
+from sender import StalePage, parse_page
+
+load_dotenv()
+
+# Сколько процессов разбирают HTML; 0 — разбирать прямо в цикле событий
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+# Сколько скачанных, но ещё не разобранных страниц может ждать разбора
+RAW_QUEUE_SIZE = int(os.getenv("RAW_QUEUE_SIZE", str(max(PARSE_WORKERS, 1) * 2)))
+# Сколько разобранных страниц может ждать отправки, пока загрузчики не притормозят
+PARSED_QUEUE_SIZE = int(os.getenv("PARSED_QUEUE_SIZE", "20"))
+
+# Пул процессов создаётся при первом проходе и живёт до shutdown_parse_pool
+_parse_pool = None
+
+
+def _exit_with_parent():
+    # Процесс разбора ждёт задач из канала, который держит открытым сам, и после SIGKILL
+    # бота остался бы висеть; поэтому он следит за родителем и выходит вместе с ним
+    parent = multiprocessing.parent_process()
+    if parent is not None:
+        threading.Thread(target=_wait_parent, args=(parent.sentinel,), daemon=True).start()
+
+
+def _wait_parent(sentinel):
+    wait([sentinel])
+    os._exit(0)
+
+
+def get_parse_pool():
+    global _parse_pool
+    if _parse_pool is None and PARSE_WORKERS > 0:
+        # spawn: дочерние процессы не наследуют сокеты и потоки цикла событий
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_exit_with_parent
+        )
+    return _parse_pool
+
+
+async def warm_up_parse_pool():
+    """
+    Запускает все процессы разбора заранее (вместе с импортом разборщика), а не на первой странице:
+    при перезапуске это делается, пока предыдущий процесс ещё дорабатывает.
+    """
+    pool = get_parse_pool()
+    if pool is None:
+        return
+    loop = asyncio.get_running_loop()
+    try:
+        with span("warm_up"):
+            await asyncio.gather(*(loop.run_in_executor(pool, os.getpid) for _ in range(PARSE_WORKERS)))
+    except Exception as e:
+        logger.error(f"Не удалось запустить процессы разбора: {e}")
+
+
+def shutdown_parse_pool():
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+async def _fail(handle_failed, message_id, link):
+    if handle_failed is None:
+        return
+    try:
+        await handle_failed(message_id, link)
+    except Exception as e:
+        logger.error(f"Ошибка при возврате записи {message_id} в очередь: {e}")
+
+
+async def _fetch_one(session, record, raw_queue, parsed_queue, semaphore, cache, handle_failed):
+    message_id, link = record
+    logger.info(f'обработка: {message_id}, {link}')
+    try:
+        cached = await cache.lookup(link) if cache is not None else None
+        if cached is not None and cached.fresh:
+            # Свежая страница из кэша: в ЕФРСБ не ходим, а если разбор с тех пор не менялся — и не разбираем
+            lots = cached.lots
+            if lots is not None:
+                PAGE_CACHE.labels(result="fresh").inc()
+                await parsed_queue.put((message_id, link, lots))
+            else:
+                PAGE_CACHE.labels(result="reparse").inc()
+                page = Page(cached.body, cached.encoding, cached.etag, cached.last_modified)
+                await raw_queue.put((message_id, link, page, cached.fetched_at))
+            return
+        with span("fetch", message_id=message_id, link=link):
+            page = await fetch_page(session, link, cached)
+        if cached is not None and (page.body is None or digest(page.body) == cached.digest):
+            # Страница не изменилась: продлеваем свежесть и берём готовые лоты
+            await cache.revalidated(link, page)
+            lots = cached.lots
+            if lots is not None:
+                PAGE_CACHE.labels(result="revalidated").inc()
+                await parsed_queue.put((message_id, link, lots))
+                return
+            PAGE_CACHE.labels(result="reparse").inc()
+            page = Page(cached.body, cached.encoding, page.etag, page.last_modified)
+        elif cache is not None:
+            PAGE_CACHE.labels(result="miss").inc()
+        # put блокируется, если разбор не успевает, — так разбор сдерживает загрузку
+        await raw_queue.put((message_id, link, page, None))
+    except Exception as e:
+        logger.error(f"Ошибка загрузки записи {message_id} с ссылкой {link}: {describe_error(e)}")
+        await _fail(handle_failed, message_id, link)
+    finally:
+        semaphore.release()
+
+
+async def _parse(raw_queue, parsed_queue, pool, cache, window, handle_failed):
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await raw_queue.get()
+        if item is None:
+            break
+        message_id, link, page, fetched_at = item
+        try:
+            # С пулом процессов в замер входит и пересылка страницы и лотов между процессами
+            with span("parse", message_id=message_id, link=link):
+                if pool is None:
+                    messages = parse_page(link, page.body, page.encoding, None, window)
+                else:
+                    messages = await loop.run_in_executor(pool, parse_page, link, page.body, page.encoding, None, window)
+        except StalePage as e:
+            # Старое сообщение не кэшируем: после handle_stale запись больше не выбирается
+            PAGES.labels(result="stale").inc()
+            await parsed_queue.put((message_id, link, e))
+            continue
+        except Exception as e:
+            PAGES.labels(result="error").inc()
+            logger.error(f"Ошибка разбора записи {message_id} с ссылкой {link}: {describe_error(e)}")
+            await _fail(handle_failed, message_id, link)
+            continue
+        PAGES.labels(result="parsed").inc()
+        LOTS_PER_PAGE.observe(len(messages))
+        if cache is not None:
+            await cache.store(link, page, messages, fetched_at)
+        # put блокируется, если отправка не успевает, — так отправка сдерживает разбор
+        await parsed_queue.put((message_id, link, messages))
+
+
+async def _consume(queue, handle_parsed, handle_stale, handle_failed):
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        message_id, link, messages = item
+        try:
+            with span("handle", message_id=message_id, link=link):
+                if isinstance(messages, StalePage):
+                    await handle_stale(message_id, link, messages.published)
+                else:
+                    await handle_parsed(message_id, link, messages)
+        except Exception as e:
+            logger.error(f"Ошибка обработки записи {message_id} с ссылкой {link}: {e}")
+            await _fail(handle_failed, message_id, link)
+
+
+async def run_pipeline(records, handle_parsed, handle_stale=None, window=None, stop=None, handle_failed=None):
+    """
+    Конвейер из трёх стадий с ограниченными очередями между ними:
+    загрузка страниц по записям (message_id, ссылка) — до FETCH_CONCURRENCY одновременно,
+    разбор HTML в пуле из PARSE_WORKERS процессов и передача результата
+    в handle_parsed(message_id, link, messages) одним потребителем.
+    Если задано окно дат публикации window, страницы с датой вне него не разбираются
+    дальше шапки и уходят в handle_stale(message_id, link, дата публикации).
+    Каждая стадия ждёт, когда следующая не успевает, поэтому память ограничена
+    размерами очередей, сколько бы записей ни пришло.
+    Страницы и их лоты кэшируются (pagecache): свежая страница не скачивается,
+    а неизменившаяся — не разбирается заново.
+    Когда взведён asyncio.Event stop, новые записи больше не берутся, а уже взятые
+    проходят конвейер до конца.
+    Запись, на которой загрузка, разбор или обработка упали с ошибкой, передаётся
+    в handle_failed(message_id, link), чтобы её можно было вернуть в очередь.
+    """
+    raw_queue = asyncio.Queue(maxsize=RAW_QUEUE_SIZE)
+    parsed_queue = asyncio.Queue(maxsize=PARSED_QUEUE_SIZE)
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+    if window is not None and handle_stale is None:
+        raise ValueError("Для окна дат публикации нужен handle_stale")
+    pool = get_parse_pool()
+    cache = get_page_cache()
+    tasks = set()
+
+    async with create_session() as session:
+        consumer = asyncio.create_task(_consume(parsed_queue, handle_parsed, handle_stale, handle_failed))
+        parsers = [
+            asyncio.create_task(_parse(raw_queue, parsed_queue, pool, cache, window, handle_failed))
+            for _ in range(max(PARSE_WORKERS, 1))
+        ]
+        try:
+            async for record in records:
+                if stop is not None and stop.is_set():
+                    # Остальные записи страницы уже в аренде: её снимает db.release_leases
+                    break
+                await semaphore.acquire()
+                task = asyncio.create_task(_fetch_one(session, record, raw_queue, parsed_queue, semaphore, cache, handle_failed))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+            for _ in parsers:
+                await raw_queue.put(None)
+            await asyncio.gather(*parsers)
+            await parsed_queue.put(None)
+            await consumer
+        finally:
+            for task in [*tasks, *parsers, consumer]:
+                task.cancel()
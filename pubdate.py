@@ -0,0 +1,83 @@
+import datetime
+import os
+import re
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Окно дат публикации, в которое должны попадать отправляемые сообщения:
+#   month                         — текущий календарный месяц (как раньше);
+#   days:N                        — последние N дней, включая сегодняшний;
+#   range:2026-01-01..2026-03-31  — произвольный диапазон, любую границу можно опустить;
+#   all                           — без ограничения.
+# Записи в messages приходят без даты: она известна только со страницы сообщения. Поэтому при первом
+# проходе по бэклогу каждая страница всё равно скачивается один раз, а окно экономит лишь её разбор
+# (sender.HEADINFO_DATE_RE); дата сохраняется в messages.publication_date, и дальше по ней отсекает база.
+PUBLICATION_WINDOW = os.getenv("PUBLICATION_WINDOW", "month")
+
+DATE_RE = re.compile(r"\d{2}\.\d{2}\.\d{4}")
+
+
+@lru_cache(maxsize=4096)
+def parse_date(text):
+    """
+    Дата из строки ЕФРСБ вида "%d.%m.%Y" (время после даты игнорируется) или None.
+    Кэшируется: у всех лотов страницы одна и та же строка из шапки.
+    """
+    if not text:
+        return None
+    match = DATE_RE.search(text)
+    if match is None:
+        return None
+    try:
+        return datetime.datetime.strptime(match.group(), "%d.%m.%Y").date()
+    except ValueError:
+        return None
+
+
+def _parse_bound(text):
+    return datetime.date.fromisoformat(text.strip()) if text.strip() else None
+
+
+def parse_window(spec):
+    """
+    Разбирает PUBLICATION_WINDOW в функцию today -> (начало, конец) с включёнными границами.
+    На неверную строку поднимает ValueError.
+    """
+    spec = spec.strip().lower()
+    if spec == "month":
+        def window(today):
+            start = today.replace(day=1)
+            following = (start + datetime.timedelta(days=32)).replace(day=1)
+            return start, following - datetime.timedelta(days=1)
+        return window
+    if spec == "all":
+        return lambda today: (datetime.date.min, datetime.date.max)
+    kind, _, value = spec.partition(":")
+    if kind == "days" and value.strip().isdigit() and int(value) > 0:
+        days = int(value)
+        return lambda today: (today - datetime.timedelta(days=days - 1), today)
+    if kind == "range" and ".." in value:
+        start, end = (_parse_bound(bound) for bound in value.split("..", 1))
+        start, end = start or datetime.date.min, end or datetime.date.max
+        return lambda today: (start, end)
+    raise ValueError(f"Неверное окно дат публикации PUBLICATION_WINDOW={spec!r}")
+
+
+_window = parse_window(PUBLICATION_WINDOW)
+
+
+def current_window(today=None):
+    """Окно (начало, конец) на сегодня. Считается один раз на проход, а не на каждый лот."""
+    return _window(today or datetime.date.today())
+
+
+def in_window(date, window):
+    return date is not None and window[0] <= date <= window[1]
+
+
+def is_published_in_window(msg, window):
+    """Проверяет, что "Дата публикации" сообщения попадает в окно window."""
+    return in_window(parse_date(msg.get("Дата публикации")), window)
@@ -0,0 +1,69 @@
+import asyncio
+
+import db
+
+
+class TokenBucket:
+    """
+    Простой token bucket: rate токенов в секунду, не больше capacity накопленных.
+    acquire() ждёт, пока появится токен, и забирает его.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = None
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        if self._updated is not None:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def pause(self, seconds):
+        """Не выдаёт токенов как минимум seconds секунд; накопленный запас сгорает."""
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + seconds)
+        self._tokens = 0
+        self._updated = self._paused_until
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        # Под замком ожидающие получают токены по очереди, а не наперегонки
+        async with self._lock:
+            while True:
+                if (delay := self._paused_until - loop.time()) > 0:
+                    await asyncio.sleep(delay)
+                    continue
+                self._refill(loop.time())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SharedTokenBucket:
+    """
+    Token bucket, общий для всех воркеров: состояние хранится в таблице rate_buckets.
+    Каждый acquire() — один запрос, который сразу резервирует слот и говорит, сколько до него ждать.
+    Если база недоступна, bucket временно работает как локальный TokenBucket.
+    """
+
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._fallback = TokenBucket(rate, capacity)
+
+    async def pause(self, seconds):
+        await self._fallback.pause(seconds)
+        await db.pause_rate_bucket(self.name, seconds)
+
+    async def acquire(self):
+        delay = await db.take_rate_token(self.name, self.rate, self.capacity)
+        if delay is None:
+            await self._fallback.acquire()
+        elif delay > 0:
+            await asyncio.sleep(delay)
@@ -0,0 +1,249 @@
+import html
+import json
+import os
+import re
+from pathlib import Path
+from string import Formatter
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Шаблоны сообщений: {"формат": {"message": ..., "header": ..., "continuation": ..., "lot": ...}}.
+# Шаблон — строка или список строк (склеиваются через перевод строки) с полями вида {Цена};
+# литеральные фигурные скобки удваиваются: {{ и }}. Каждый HTML-тег должен открываться
+# и закрываться в одной строке шаблона, иначе digest.split_html может разрезать его пополам.
+MESSAGE_TEMPLATES_FILE = Path(
+    os.getenv("MESSAGE_TEMPLATES_FILE", Path(__file__).resolve().parent / "templates.json")
+)
+# Формат по умолчанию; в нём должны быть все четыре шаблона, остальные форматы берут из него недостающие
+MESSAGE_FORMAT = os.getenv("MESSAGE_FORMAT", "full")
+# Форматы отдельных каналов: "@realty=compact;@auto=full"
+CHANNEL_FORMATS = os.getenv("CHANNEL_FORMATS", "")
+
+TEMPLATE_NAMES = ("message", "header", "continuation", "lot")
+
+INN_RE = re.compile(r'ИНН[:\s]*(\d+)')
+
+
+def short_description(data, words=15):
+    # Извлечение первых 10–15 слов описания
+    description_words = data.get('Описание', 'Описание отсутствует').split()
+    return ' '.join(description_words[:words]) + ('...' if len(description_words) > words else '')
+
+
+def arbiter_info(data):
+    """ФИО и ИНН арбитражного управляющего, а если его нет — организатора торгов."""
+    au_info = data.get('Арбитражный управляющий', '').strip()
+    if not au_info or au_info == 'Неизвестно':
+        au_info = data.get('Организатор торгов', 'Неизвестно').strip()
+
+    if au_info and au_info != 'Неизвестно':
+        fio_au = au_info.split(' (ИНН')[0] if ' (ИНН' in au_info else au_info
+        match = INN_RE.search(au_info)
+        if match:
+            inn = match.group(1)
+        else:
+            inn = 'Неизвестно'
+    else:
+        fio_au = 'Неизвестно'
+        inn = 'Неизвестно'
+    return fio_au, inn
+
+
+def header_fields(data):
+    """Поля шапки объявления: одинаковы у всех лотов страницы."""
+    fio_au, inn = arbiter_info(data)
+    return {
+        'Дата публикации': data.get('Дата публикации', 'Не указана'),
+        'Вид торгов': data.get('Вид торгов', 'Не указан'),
+        'ФИО АУ': fio_au,
+        'ИНН АУ': inn,
+        'E-mail': data.get('E-mail', 'отсутствует'),
+        'ФИО должника': data.get('ФИО должника', 'Не указано'),
+        'ИНН должника': data.get('ИНН', 'Не указан'),
+        'Ссылка': data.get('Ссылка', '#'),
+    }
+
+
+def lot_fields(lot_no, data):
+    """Поля самого лота."""
+    return {
+        'Номер лота': str(lot_no),
+        'Классификация': data.get('Классификация', 'Без категории'),
+        'Описание': short_description(data),
+        'Цена': data.get('Цена', 'Не указана'),
+    }
+
+
+# Число лотов объявления в канале — тоже часть шапки, но известно только при отправке
+LOTS_TOTAL_FIELD = 'Лотов'
+HEADER_FIELDS = frozenset(header_fields({})) | {LOTS_TOTAL_FIELD}
+LOT_FIELDS = frozenset(lot_fields(0, {}))
+
+
+class Template:
+    """
+    Шаблон, разобранный один раз при загрузке: последовательность кусков шапки
+    (литералы и поля шапки подряд) и полей лота между ними.
+    """
+
+    def __init__(self, name, text):
+        self.name = name
+        # Куски: кортеж [(литерал, поле шапки или None)] или имя поля лота
+        self.runs = []
+        run = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if literal:
+                run.append((literal, None))
+            if field is None:
+                continue
+            if spec or conversion:
+                raise ValueError(f"Шаблон {name}: у поля {{{field}}} не поддерживаются :формат и !преобразование")
+            if field in LOT_FIELDS:
+                self.runs += [tuple(run), field]
+                run = []
+            elif field in HEADER_FIELDS:
+                run.append(("", field))
+            else:
+                raise ValueError(f"Шаблон {name}: неизвестное поле {{{field}}}")
+        self.runs.append(tuple(run))
+        self.per_lot = any(isinstance(item, str) for item in self.runs)
+
+    def __repr__(self):
+        return f"Template({self.name!r})"
+
+
+class MessageFormat:
+    """Набор шаблонов одного формата сообщений."""
+
+    def __init__(self, name, templates, fallback=None):
+        self.name = name
+        for template_name in TEMPLATE_NAMES:
+            text = templates.get(template_name)
+            if text is None:
+                if fallback is None:
+                    raise ValueError(f"В формате {name} нет шаблона {template_name}")
+                template = getattr(fallback, template_name)
+            else:
+                if isinstance(text, list):
+                    text = "\n".join(text)
+                template = Template(f"{name}.{template_name}", text)
+            setattr(self, template_name, template)
+
+
+def load_formats(path=MESSAGE_TEMPLATES_FILE, default=MESSAGE_FORMAT):
+    """Читает и компилирует все форматы из файла шаблонов; на ошибку в шаблоне поднимает ValueError."""
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    if default not in spec:
+        raise ValueError(f"В {path} нет формата по умолчанию MESSAGE_FORMAT={default!r}")
+    formats = {default: MessageFormat(default, spec[default])}
+    for name, templates in spec.items():
+        if name != default:
+            formats[name] = MessageFormat(name, templates, formats[default])
+    return formats
+
+
+def parse_channel_formats(spec, formats):
+    """Разбирает строку вида "канал=формат;канал2=формат2" в словарь {канал: формат}."""
+    result = {}
+    for part in spec.split(';'):
+        if '=' not in part:
+            continue
+        channel, name = (value.strip() for value in part.split('=', 1))
+        if not channel or not name:
+            continue
+        if name not in formats:
+            raise ValueError(f"CHANNEL_FORMATS: у канала {channel} неизвестный формат {name!r}")
+        result[channel] = name
+    return result
+
+
+FORMATS = load_formats()
+_channel_formats = parse_channel_formats(CHANNEL_FORMATS, FORMATS)
+
+
+def get_format(name=None):
+    """Формат по имени, по умолчанию — MESSAGE_FORMAT."""
+    return FORMATS[name or MESSAGE_FORMAT]
+
+
+def format_for(chat_id):
+    """Формат сообщений канала chat_id по CHANNEL_FORMATS."""
+    return FORMATS[_channel_formats.get(str(chat_id), MESSAGE_FORMAT)]
+
+
+class Announcement:
+    """
+    Тексты сообщений одного объявления (страницы ЕФРСБ).
+    Поля шапки экранируются один раз на объявление, куски шаблона между полями лота
+    склеиваются один раз на шаблон и переиспользуются всеми лотами. На лот экранируются
+    только его поля, а готовый текст запоминается: каналы с одним форматом получают
+    одну и ту же строку.
+    """
+
+    def __init__(self, lots):
+        # lots — лоты страницы по порядку (Lot или dict); шапка берётся из первого
+        self.lots = lots
+        self._header = {
+            field: html.escape(value) for field, value in header_fields(lots[0] if lots else {}).items()
+        }
+        self._lot_values = {}
+        self._prepared = {}
+        self._texts = {}
+
+    def _prepare(self, template, lots_total):
+        """Куски шаблона с подставленной шапкой и позиции полей лота в них."""
+        key = (template, lots_total)
+        prepared = self._prepared.get(key)
+        if prepared is None:
+            header = self._header
+            header[LOTS_TOTAL_FIELD] = str(lots_total) if lots_total is not None else ""
+            parts, holes = [], []
+            for item in template.runs:
+                if isinstance(item, str):
+                    holes.append((len(parts), item))
+                    parts.append("")
+                elif item:
+                    parts.append("".join(header[field] if field else literal for literal, field in item))
+            prepared = self._prepared[key] = (parts, holes)
+        return prepared
+
+    def _lot(self, lot_no):
+        values = self._lot_values.get(lot_no)
+        if values is None:
+            values = self._lot_values[lot_no] = {
+                field: html.escape(value) for field, value in lot_fields(lot_no, self.lots[lot_no - 1]).items()
+            }
+        return values
+
+    def render(self, template, lot_no=None, lots_total=None):
+        """Текст по шаблону для лота lot_no (номер на странице, с 1) или, для шаблонов без полей лота, — один на объявление."""
+        key = (template, lot_no if template.per_lot else None, lots_total)
+        text = self._texts.get(key)
+        if text is None:
+            parts, holes = self._prepare(template, lots_total)
+            if holes:
+                values = self._lot(lot_no)
+                parts = parts.copy()
+                for position, field in holes:
+                    parts[position] = values[field]
+            text = self._texts[key] = "".join(parts)
+        return text
+
+    def message(self, lot_no, message_format=None):
+        """Отдельное сообщение о лоте."""
+        return self.render((message_format or get_format()).message, lot_no)
+
+    def header(self, lots_total, message_format=None):
+        """Шапка сводки или треда: общая часть объявления, один раз на канал."""
+        return self.render((message_format or get_format()).header, lots_total=lots_total)
+
+    def continuation(self, message_format=None):
+        """Начало второй и следующих сводок объявления."""
+        return self.render((message_format or get_format()).continuation)
+
+    def lot(self, lot_no, message_format=None):
+        """Лот без общей части: строка сводки или ответ в треде."""
+        return self.render((message_format or get_format()).lot, lot_no)
@@ -0,0 +1,51 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Маршруты по категориям: "Недвижимость=@realty;Транспорт=@auto,@auto_backup"
+CHANNEL_ROUTES = os.getenv("CHANNEL_ROUTES", "")
+# Канал, куда дополнительно уходят все лоты
+CHANNEL_ALL = os.getenv("CHANNEL_ALL", "").strip()
+# Канал по умолчанию для лотов, которым не нашлось ни одного маршрута
+CHANNEL_ID = os.getenv("CHANNEL_ID", "").strip()
+
+
+def parse_routes(spec):
+    """
+    Разбирает строку вида "Категория=канал1,канал2;Категория2=канал3"
+    в словарь {категория: [каналы]}.
+    """
+    routes = {}
+    for part in spec.split(';'):
+        if '=' not in part:
+            continue
+        category, channels = part.split('=', 1)
+        channels = [channel.strip() for channel in channels.split(',') if channel.strip()]
+        if category.strip() and channels:
+            routes.setdefault(category.strip(), []).extend(channels)
+    return routes
+
+
+ROUTES = parse_routes(CHANNEL_ROUTES)
+
+
+def resolve_destinations(category):
+    """
+    Возвращает список каналов для лота с классификацией category, без повторов.
+    Если не задан ни маршрут категории, ни CHANNEL_ALL, лот уходит в CHANNEL_ID.
+    """
+    destinations = list(ROUTES.get(category, []))
+    if CHANNEL_ALL:
+        destinations.append(CHANNEL_ALL)
+    if not destinations and CHANNEL_ID:
+        destinations.append(CHANNEL_ID)
+    return list(dict.fromkeys(destinations))
+
+
+def all_channels():
+    """Все каналы, куда бот может что-то опубликовать."""
+    channels = [channel for channels in ROUTES.values() for channel in channels]
+    channels += [CHANNEL_ALL, CHANNEL_ID]
+    return [channel for channel in dict.fromkeys(channels) if channel]
@@ -0,0 +1,270 @@
+import asyncio
+import os
+from collections import deque
+from dataclasses import dataclass
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from dotenv import load_dotenv
+
+from logScript import logger
+from metrics import FLOOD_WAIT_SECONDS, SEND_QUEUE_SECONDS, SENDS, span
+from ratelimit import TokenBucket
+
+load_dotenv()
+
+# Лимиты Telegram: около 30 сообщений в секунду на бота и 20 сообщений в минуту в один канал/группу
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_CHAT_RATE_PER_MINUTE = float(os.getenv("SEND_CHAT_RATE_PER_MINUTE", "20"))
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "3"))
+SEND_MAX_ATTEMPTS = int(os.getenv("SEND_MAX_ATTEMPTS", "5"))
+SEND_RETRY_DELAY = float(os.getenv("SEND_RETRY_DELAY", "2"))
+# Размер очереди каждого канала; в заполненную очередь submit(wait=False) сообщение не ставит (DEFERRED)
+SEND_QUEUE_SIZE = int(os.getenv("SEND_QUEUE_SIZE", "100"))
+# Сколько последних неотправленных сообщений держим в памяти для разбора
+DEAD_LETTERS_KEEP = int(os.getenv("DEAD_LETTERS_KEEP", "1000"))
+
+SENT = "sent"
+DEAD = "dead"
+# Не отправлено, запроса к Telegram не было: бот останавливается (abort) или не записалась отметка before_send
+CANCELLED = "cancelled"
+# Не принято: очередь канала заполнена, сообщение нужно поставить позже
+DEFERRED = "deferred"
+
+
+@dataclass
+class SendJob:
+    chat_id: str
+    text: str
+    future: asyncio.Future
+    # id сообщения, на которое отвечаем, или future другого SendJob этого же чата (шапки треда)
+    reply_to: object = None
+    # Время постановки в очередь (loop.time()), для efrsb_send_queue_seconds
+    submitted: float = 0.0
+    # Функция без аргументов, которая строит текст на случай, если сообщение reply_to не ушло
+    standalone: object = None
+    # Корутинная функция без аргументов, которую ждут прямо перед первым запросом к Telegram
+    before_send: object = None
+    # Попытки, закончившиеся ошибкой или успехом; паузы flood control считаются отдельно
+    attempts: int = 0
+    flood_waits: int = 0
+    status: str = None
+    message_id: int = None
+    error: str = None
+
+
+class SendScheduler:
+    """
+    Очереди отправки в Telegram: у каждого чата своя очередь, свой обработчик и свой token bucket,
+    поэтому медленный или сбоящий канал не задерживает остальные. Общий token bucket держит лимит бота.
+    send(chat_id, text, reply_to) — корутина, которая делает одну попытку и возвращает aiogram Message.
+
+    bucket_factory(name, rate, capacity) создаёт bucket'ы ("global" и "chat:<chat_id>"); по умолчанию
+    это локальные TokenBucket, для общего на несколько воркеров бюджета — ratelimit.SharedTokenBucket.
+
+    При TelegramRetryAfter общий bucket, а с ним все очереди, ставится на паузу на retry_after секунд,
+    и сообщение отправляется снова: такие паузы не засчитываются в попытки, иначе всплеск flood control
+    оставил бы лоты неотправленными навсегда. Сетевые и серверные ошибки повторяются, всего не больше
+    max_attempts попыток;
+    остальные ошибки API повторять бессмысленно. Сообщение, которое так и не ушло,
+    получает статус DEAD и попадает в dead_letters.
+
+    abort() останавливает отправку при выключении бота: всё, что ещё ждёт очереди или лимита,
+    получает статус CANCELLED, а запрос, уже ушедший в Telegram, дожидается ответа.
+    CANCELLED получает и сообщение, для которого не удалась отметка before_send.
+
+    submit(wait=False) не ждёт места в заполненной очереди чата: сообщение сразу получает статус
+    DEFERRED, а чат попадает в deferred_chats; wait_deferred() дожидается, пока такие очереди опустеют.
+    """
+
+    def __init__(self, send, global_rate=SEND_GLOBAL_RATE, chat_rate_per_minute=SEND_CHAT_RATE_PER_MINUTE,
+                 chat_burst=SEND_CHAT_BURST, max_attempts=SEND_MAX_ATTEMPTS, queue_size=SEND_QUEUE_SIZE,
+                 bucket_factory=None):
+        self.send = send
+        self.bucket_factory = bucket_factory or (lambda name, rate, capacity: TokenBucket(rate, capacity))
+        self.max_attempts = max_attempts
+        self.chat_rate = chat_rate_per_minute / 60
+        self.chat_burst = chat_burst
+        self.queue_size = queue_size
+        self.global_bucket = self.bucket_factory("global", global_rate, global_rate)
+        self.chat_buckets = {}
+        self.dead_letters = deque(maxlen=DEAD_LETTERS_KEEP)
+        # Чаты, в заполненную очередь которых submit(wait=False) не поставил сообщение
+        self.deferred_chats = set()
+        self._queues = {}
+        self._workers = {}
+        # Обработчики, которые сейчас ждут ответа Telegram: abort их не прерывает
+        self._sending = set()
+        self._aborted = False
+
+    def _chat_queue(self, chat_id):
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = asyncio.Queue(maxsize=self.queue_size)
+            self._workers[chat_id] = asyncio.create_task(self._run(queue))
+        return queue
+
+    async def submit(self, chat_id, text, reply_to=None, before_send=None, standalone=None, wait=True):
+        """
+        Ставит сообщение в очередь чата и возвращает future, который завершится этим же SendJob
+        со статусом SENT или DEAD. Если очередь заполнена, submit ждёт места, а при wait=False
+        возвращает уже завершённый future со статусом DEFERRED, ничего не ожидая.
+        reply_to — id сообщения или future, полученный от submit раньше для того же чата:
+        очередь чата идёт по порядку, так что к отправке ответа тот уже завершён.
+        Если сообщение, на которое отвечаем, не ушло, ответ отправляется обычным сообщением
+        с текстом standalone(), если standalone задан (ответ в треде без шапки неполон).
+        before_send — корутинная функция, которую ждут перед первой попыткой (отметка в журнале);
+        если она вернула ложь или упала, сообщение не отправляется и получает статус CANCELLED.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        job = SendJob(
+            chat_id=chat_id, text=text, future=future, reply_to=reply_to, submitted=loop.time(),
+            standalone=standalone, before_send=before_send
+        )
+        if self._aborted:
+            job.status = CANCELLED
+            future.set_result(job)
+            return future
+        queue = self._chat_queue(chat_id)
+        if not wait and queue.full():
+            self.deferred_chats.add(chat_id)
+            job.status = DEFERRED
+            future.set_result(job)
+            return future
+        await queue.put(job)
+        return future
+
+    async def wait_deferred(self):
+        """Ждёт, пока опустеют очереди чатов из deferred_chats, и очищает этот список."""
+        chats, self.deferred_chats = self.deferred_chats, set()
+        await asyncio.gather(*(self._queues[chat_id].join() for chat_id in chats if chat_id in self._queues))
+
+    async def join(self):
+        await asyncio.gather(*(queue.join() for queue in list(self._queues.values())))
+
+    async def close(self):
+        await self.join()
+        for worker in self._workers.values():
+            worker.cancel()
+        self._workers.clear()
+        self._queues.clear()
+
+    async def abort(self):
+        """
+        Останавливает отправку, не дожидаясь очередей: обработчики, которые ждут очереди,
+        лимита или повтора, отменяются, а те, что ждут ответа Telegram, получают его и выходят.
+        Все оставшиеся в очередях сообщения завершаются со статусом CANCELLED.
+        """
+        self._aborted = True
+        running = set(self._workers.values())
+        while running:
+            # Обработчик, дождавшийся ответа Telegram, тоже отменяется, если сам не вышел
+            for worker in running:
+                if worker not in self._sending:
+                    worker.cancel()
+            _, running = await asyncio.wait(running, timeout=0.1)
+        for queue in self._queues.values():
+            while not queue.empty():
+                job = queue.get_nowait()
+                job.status = CANCELLED
+                job.future.set_result(job)
+                queue.task_done()
+        self._workers.clear()
+        self._queues.clear()
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = self.bucket_factory(f"chat:{chat_id}", self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _run(self, queue):
+        while not self._aborted:
+            job = await queue.get()
+            try:
+                await self._process(job)
+            except Exception as e:
+                job.status, job.error = DEAD, repr(e)
+            finally:
+                if job.status is None:
+                    # Обработчик отменён остановкой (abort) до запроса к Telegram
+                    job.status = CANCELLED
+                if job.status == DEAD:
+                    SENDS.labels(result="dead").inc()
+                    self.dead_letters.append(job)
+                    logger.error(f"Сообщение в {job.chat_id} не отправлено после {job.attempts} попыток: {job.error}")
+                if not job.future.done():
+                    job.future.set_result(job)
+                queue.task_done()
+
+    async def _reply_to(self, job):
+        if isinstance(job.reply_to, asyncio.Future):
+            parent = await job.reply_to
+            return parent.message_id if parent.status == SENT else None
+        return job.reply_to
+
+    async def _checkpoint(self, job, before_send):
+        """
+        Ждёт before_send перед первым запросом. Если отметка не записалась, сообщение не отправляется
+        и получает статус CANCELLED: иначе после перезапуска его нельзя было бы отличить
+        от неотправленного, и оно ушло бы второй раз.
+        """
+        try:
+            if await before_send():
+                return True
+            job.error = "не удалось отметить попытку отправки"
+        except Exception as e:
+            job.error = repr(e)
+        logger.error(f"Сообщение в {job.chat_id} не отправлено: {job.error}")
+        job.status = CANCELLED
+        return False
+
+    async def _process(self, job):
+        chat_bucket = self._chat_bucket(job.chat_id)
+        reply_to = await self._reply_to(job)
+        if reply_to is None and job.reply_to is not None and job.standalone is not None:
+            job.text = job.standalone()
+        SEND_QUEUE_SECONDS.observe(asyncio.get_running_loop().time() - job.submitted)
+        while job.attempts < self.max_attempts:
+            if self._aborted:
+                job.status = CANCELLED
+                return
+            await chat_bucket.acquire()
+            # Общий bucket последним: он же держит паузу flood control
+            await self.global_bucket.acquire()
+            job.attempts += 1
+            worker = asyncio.current_task()
+            # От отметки о попытке до ответа Telegram abort обработчик не прерывает:
+            # иначе не узнать, опубликовано ли сообщение
+            self._sending.add(worker)
+            try:
+                if job.before_send is not None:
+                    before_send, job.before_send = job.before_send, None
+                    if not await self._checkpoint(job, before_send):
+                        return
+                with span("send", chat_id=job.chat_id, attempt=job.attempts):
+                    message = await self.send(job.chat_id, job.text, reply_to)
+            except TelegramRetryAfter as e:
+                SENDS.labels(result="flood").inc()
+                FLOOD_WAIT_SECONDS.inc(e.retry_after)
+                logger.error(f"Flood control: ждем {e.retry_after} секунд перед повторной отправкой")
+                job.error = str(e)
+                # Сообщение не отклонено, а отложено: попытка не засчитывается
+                job.attempts -= 1
+                job.flood_waits += 1
+                await self.global_bucket.pause(e.retry_after)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                SENDS.labels(result="retry").inc()
+                job.error = str(e)
+                delay = SEND_RETRY_DELAY * 2 ** (job.attempts - 1)
+                logger.warning(f"Ошибка при отправке сообщения (попытка {job.attempts}): {e}, повтор через {delay:.0f} с")
+                # Ответ получен: паузу перед повтором abort может прервать
+                self._sending.discard(worker)
+                await asyncio.sleep(delay)
+            else:
+                SENDS.labels(result="sent").inc()
+                job.status, job.message_id = SENT, message.message_id
+                return
+            finally:
+                self._sending.discard(worker)
+        job.status = DEAD
@@ -1,36 +1,41 @@
-import requests
-from bs4 import BeautifulSoup
-
-CATEGORIES = {
-    "Транспорт": [
-        "автомобиль", "машина", "грузовик", "коммерческий транспорт",
-        "автобус", "спецтехника", "прицеп", "водный транспорт",
-        "катер", "яхта", "лодка", "авиатехника", "самолет",
-        "вертолет", "мотоцикл", "мототехника", "скутер"
-    ],
-    "Недвижимость": [
-        "жилая недвижимость", "нежилая недвижимость", "квартира", "комната",
-        "дом", "участок", "земельный участок", "гараж", "машино-место",
-        "помещение", "офис", "здание"
-    ],
-    "Производство и электроника": [
-        "оборудование", "станок", "производственное помещение", "промышленное",
-        "компьютер", "оргтехника", "электроника", "инструмент", "станки",
-        "производство", "софт", "имущественный комплекс"
-    ],
-    "Задолженности и ценные бумаги": [
-        "долг", "задолженность", "ценные бумаги", "акции", "облигации",
-        "права требования"
-    ],
-    "Торговое оборудование и ТМЦ": [
-        "торговое оборудование", "тмц", "мебель", "драгоценности",
-        "ювелирные изделия", "товарно-материальные ценности"
-    ],
-    "Сельское хозяйство": [
-        "сельское хозяйство", "сельхоз", "трактор", "комбайн", "ферма",
-        "сельхозтехника"
-    ]
-}
+import os
+import re
+from collections.abc import Mapping
+
+from bs4 import BeautifulSoup, SoupStrainer
+from dotenv import load_dotenv
+
+from classifier import get_classifier
+from pubdate import in_window, parse_date
+
+try:
+    import lxml.html
+except ImportError:  # lxml необязателен, без него разбираем через bs4
+    lxml = None
+
+load_dotenv()
+
+# Движок разбора страниц: auto (lxml, если установлен), lxml или bs4
+PARSER_BACKEND = os.getenv("PARSER_BACKEND", "auto")
+
+# Дата публикации из table.headInfo прямо по HTML, чтобы не строить дерево для старых сообщений.
+# Страница к этому моменту уже скачана: у новой записи даты в базе нет, отсечь её до загрузки нечем
+HEADINFO_DATE_RE = re.compile(r'class="headInfo".{0,2000}?Дата публикации.{0,300}?(\d{2}\.\d{2}\.\d{4})', re.S)
+# Объявление XML в начале XHTML-страницы: lxml не разбирает str, в котором указана кодировка
+XML_DECLARATION_RE = re.compile(r'\A\ufeff?\s*<\?xml[^>]*\?>')
+
+
+class StalePage(Exception):
+    """Дата публикации сообщения вне окна PUBLICATION_WINDOW: лоты не нужны, запись можно закрыть."""
+
+    def __init__(self, link, published):
+        super().__init__(link, published)
+        self.link = link
+        self.published = published
+
+    def __str__(self):
+        return f"сообщение {self.link} опубликовано {self.published:%d.%m.%Y}, вне окна публикации"
+
 
 def clean_text(text):
     """Удаляет лишние символы из текста и приводит его в читаемый вид"""
@@ -42,142 +47,270 @@ def clean_text(text):
 
 def determine_classification(description):
     """
-    Пример простой эвристики для определения классификации на основе ключевых слов в описании.
-    Можешь расширять или модифицировать словарь по мере необходимости.
+    Определяет категорию лота по ключевым словам из словаря categories.json (см. classifier).
+    Возвращает "Не определена", если ни одно ключевое слово не нашлось.
+    """
+    return get_classifier().classify(description)
+
+
+class Lot(Mapping):
+    """
+    Неизменяемая запись лота: общая для всех лотов страницы шапка (header)
+    и поля самого лота (fields), которые перекрывают шапку.
+    Ведёт себя как dict, который раньше получался из data.copy() + update(),
+    включая порядок ключей, но шапка не копируется на каждый лот.
+    """
+    __slots__ = ("header", "fields")
+
+    def __init__(self, header, fields):
+        self.header = header
+        self.fields = fields
+
+    def __getitem__(self, key):
+        if key in self.fields:
+            return self.fields[key]
+        return self.header[key]
+
+    def __iter__(self):
+        yield from self.header
+        for key in self.fields:
+            if key not in self.header:
+                yield key
+
+    def __len__(self):
+        return len(self.header) + sum(1 for key in self.fields if key not in self.header)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def __reduce__(self):
+        return Lot, (self.header, self.fields)
+
+
+def _single_string_bs4(element):
+    return element.string
+
+
+def _single_string_lxml(element):
+    # Аналог bs4 Tag.string: текст элемента, если внутри ровно один узел — строка или тег с одной строкой
+    children = list(element)
+    if not children:
+        return element.text or None
+    if len(children) == 1 and not element.text and not children[0].tail:
+        child = children[0]
+        return _single_string_lxml(child) if isinstance(child.tag, str) else None
+    return None
+
+
+class _Bs4Backend:
+    name = "bs4"
+    # В дерево попадают только теги, которые нужны разбору; SoupStrainer отбрасывает <head> со скриптами
+    strainer = SoupStrainer(["h1", "div", "table"])
+
+    def elements(self, page):
+        soup = BeautifulSoup(page, "html.parser", parse_only=self.strainer)
+        return soup.find_all(["h1", "div", "table"])
+
+    def tag(self, element):
+        return element.name
+
+    def has_class(self, element, cls):
+        return cls in (element.get("class") or ())
+
+    def string(self, element):
+        return _single_string_bs4(element)
+
+    def text(self, element):
+        return element.text
+
+    def rows(self, table):
+        return [[td.text.strip() for td in row.find_all("td")] for row in table.find_all("tr")]
+
+    def headers(self, table):
+        return [th.text.strip() for th in table.find_all("th")]
+
+
+class _LxmlBackend:
+    name = "lxml"
+
+    def elements(self, page):
+        # Страница уже раскодирована, поэтому объявление кодировки только мешает
+        page = XML_DECLARATION_RE.sub("", page, count=1)
+        return lxml.html.document_fromstring(page).iter("h1", "div", "table")
+
+    def tag(self, element):
+        return element.tag
+
+    def has_class(self, element, cls):
+        return cls in (element.get("class") or "").split()
+
+    def string(self, element):
+        return _single_string_lxml(element)
+
+    def text(self, element):
+        return str(element.text_content())
+
+    def rows(self, table):
+        return [[str(td.text_content()).strip() for td in row.iter("td")] for row in table.iter("tr")]
+
+    def headers(self, table):
+        return [str(th.text_content()).strip() for th in table.iter("th")]
+
+
+BACKENDS = {"bs4": _Bs4Backend()}
+if lxml is not None:
+    BACKENDS["lxml"] = _LxmlBackend()
+
+
+def get_backend(name=None):
+    name = name or PARSER_BACKEND
+    if name == "auto":
+        name = "lxml" if "lxml" in BACKENDS else "bs4"
+    if name not in BACKENDS:
+        raise ValueError(f"Движок разбора {name} недоступен, есть: {', '.join(BACKENDS)}")
+    return BACKENDS[name]
+
+
+# Подписи разделов, после которых идёт нужная таблица
+SECTIONS = ("Должник", "Кем опубликовано", "Публикуемые сведения", "Сведения об объектах оценки")
+
+
+def _scan(backend, page):
+    """
+    Один проход по h1/div/table страницы в порядке документа.
+    Возвращает заголовок, table.headInfo, table.lotInfo и таблицы разделов SECTIONS
+    (первая таблица после первого div с точной подписью, как soup.find(...).find_next('table')).
     """
-    desc_lower = description.lower()
-    for category, keywords in CATEGORIES.items():
-        for keyword in keywords:
-            if keyword in desc_lower:
-                return category
-    return "Не определена"
+    title = head_info = lot_info = None
+    sections = {}
+    waiting = []
+    for element in backend.elements(page):
+        tag = backend.tag(element)
+        if tag == "table":
+            for section in waiting:
+                sections[section] = element
+            waiting = []
+            if head_info is None and backend.has_class(element, "headInfo"):
+                head_info = element
+            if lot_info is None and backend.has_class(element, "lotInfo"):
+                lot_info = element
+        elif tag == "div":
+            string = backend.string(element)
+            if string in SECTIONS and string not in sections and string not in waiting:
+                waiting.append(string)
+        elif tag == "h1" and title is None and backend.has_class(element, "red_small"):
+            title = element
+    return title, head_info, lot_info, sections
+
+
+def _pairs(backend, table):
+    return [(cells[0], cells[1]) for cells in backend.rows(table) if len(cells) == 2]
+
 
-def link_parser(link):
-    response = requests.post(link)
-    soup = BeautifulSoup(response.text, 'html.parser')
+def _lots(backend, table, header, classification_column, price):
+    rows = backend.rows(table)
+    headers = backend.headers(table)
+    lots = []
+    for lot_row in rows[1:]:
+        lot_dict = dict(zip(headers, lot_row))
+
+        lot_description = lot_dict.get("Описание", "").strip()
+        classification_text = lot_dict.get(classification_column, "").strip()
+
+        if classification_text:
+            mapped_category = determine_classification(classification_text)
+            # Если не удалось сопоставить по колонке, пробуем по описанию
+            if mapped_category == "Не определена" and lot_description:
+                mapped_category = determine_classification(lot_description)
+        else:
+            mapped_category = determine_classification(lot_description)
+
+        lots.append(Lot(header, {
+            "Описание": lot_description if lot_description else "нету",
+            "Классификация": mapped_category,
+            "Цена": price(lot_dict)
+        }))
+    return lots
+
+
+def link_parser(link, page, backend=None, window=None):
+    """
+    Разбирает уже загруженную страницу сообщения (page — HTML) и возвращает список лотов (Lot).
+    Загрузка страницы вынесена в fetcher.fetch_page.
+    backend — имя движка разбора (bs4, lxml или auto), по умолчанию PARSER_BACKEND.
+    window — окно дат публикации (pubdate.current_window); если дата из шапки в него не попадает,
+    поднимается StalePage, по возможности ещё до построения дерева страницы.
+    """
+    if window is not None:
+        match = HEADINFO_DATE_RE.search(page)
+        published = parse_date(match.group(1)) if match else None
+        if published is not None and not in_window(published, window):
+            raise StalePage(link, published)
+
+    backend = get_backend(backend)
+    title_element, table_headinfo, table_lotinfo, sections = _scan(backend, page)
 
     data = {
         'Ссылка': link
     }
 
-    messages = []
-
     # Извлечение заголовка сообщения
-    title = soup.find('h1', class_='red_small').text.strip()
-
+    if title_element is None:
+        raise ValueError(f"На странице {link} нет заголовка сообщения")
+    title = backend.text(title_element).strip()
 
-    table_headinfo = soup.find('table', class_='headInfo')
-    if table_headinfo:
-        raws = table_headinfo.find_all('tr')
-        for raw in raws:
-            cells = raw.find_all('td')
-            if len(cells) == 2:
-                field = cells[0].text.strip()
-                value = cells[1].text.strip()
-                if "Дата публикации" in field:
-                    data['Дата публикации'] = value
+    if table_headinfo is not None:
+        for field, value in _pairs(backend, table_headinfo):
+            if "Дата публикации" in field:
+                data['Дата публикации'] = value
 
+    if window is not None:
+        published = parse_date(data.get('Дата публикации'))
+        if published is not None and not in_window(published, window):
+            raise StalePage(link, published)
 
     # Данные о должнике
-    debtor_section = soup.find('div', string="Должник")
-    if debtor_section:
-        debtor_table = debtor_section.find_next('table')
-        if debtor_table:
-            debtor_rows = debtor_table.find_all('tr')
-            for row in debtor_rows:
-                cells = row.find_all('td')
-                if len(cells) == 2:
-                    field = cells[0].text.strip()
-                    value = cells[1].text.strip()
-
-                    if 'ФИО должника' in field:
-                        data['ФИО должника'] = value
-                    elif 'Наименование должника' in field:
-                        data['ФИО должника'] = value
-                    else:
-                        data[field] = clean_text(value)
+    if "Должник" in sections:
+        for field, value in _pairs(backend, sections["Должник"]):
+            if 'ФИО должника' in field:
+                data['ФИО должника'] = value
+            elif 'Наименование должника' in field:
+                data['ФИО должника'] = value
+            else:
+                data[field] = clean_text(value)
 
     # Информация об арбитражном управляющем
-    arbiter_section = soup.find('div', string="Кем опубликовано")
-    if arbiter_section:
-        arbiter_table = arbiter_section.find_next('table')
-        if arbiter_table:
-            arbiter_rows = arbiter_table.find_all('tr')
-            for row in arbiter_rows:
-                cells = row.find_all('td')
-                if len(cells) == 2:
-                    field = cells[0].text.strip()
-                    value = cells[1].text.strip()
-                    data[field] = clean_text(value)
+    if "Кем опубликовано" in sections:
+        for field, value in _pairs(backend, sections["Кем опубликовано"]):
+            data[field] = clean_text(value)
+
+    messages = []
 
     if "Объявление о проведении торгов" in title:
-        info_section = soup.find('div', string="Публикуемые сведения")
-        if info_section:
-            info_table = info_section.find_next('table')
-            if info_table:
-                info_rows = info_table.find_all('tr')
-                for row in info_rows:
-                    cells = row.find_all('td')
-                    if len(cells) == 2:
-                        field = cells[0].text.strip()
-                        value = cells[1].text.strip()
-
-                        if "Вид торгов" in field:
-                            data[field] = value
-
-        table_lotinfo = soup.find('table', class_='lotInfo')
-        if table_lotinfo:
-            rows = table_lotinfo.find_all('tr')
-            headers = [th.text.strip() for th in table_lotinfo.find_all("th")]
-            for row in rows[1:]:
-                lot_row = [td.text.strip() for td in row.find_all("td")]  # Извлекаем текст ячеек
-                lot_dict = dict(zip(headers, lot_row))
-                lot = data.copy()
-
-                lot_description = lot_dict.get("Описание", "").strip()
-                classification_text = lot_dict.get("Классификация имущества", "").strip()
-
-                if classification_text:
-                    mapped_category = determine_classification(classification_text)
-                    # Если не удалось сопоставить по колонке, пробуем по описанию
-                    if mapped_category == "Не определена" and lot_description:
-                        mapped_category = determine_classification(lot_description)
-                else:
-                    mapped_category = determine_classification(lot_description)
-
-                lot.update({
-                    "Описание":lot_description if lot_description else "нету",
-                    "Классификация": mapped_category,
-                    "Цена": lot_dict["Начальная цена, руб"].strip()
-                })
-                messages.append(lot)
+        if "Публикуемые сведения" in sections:
+            for field, value in _pairs(backend, sections["Публикуемые сведения"]):
+                if "Вид торгов" in field:
+                    data[field] = value
+
+        if table_lotinfo is not None:
+            messages += _lots(
+                backend, table_lotinfo, data, "Классификация имущества",
+                lambda lot_dict: lot_dict["Начальная цена, руб"].strip()
+            )
 
     if "Отчет оценщика об оценке имущества должника" in title:
-        lot_section = soup.find('div', string="Сведения об объектах оценки")
-        if lot_section:
-            lot_table = lot_section.find_next("table")
-            if lot_table:
-                lot_rows = lot_table.find_all('tr')
-                headers = [th.text.strip() for th in lot_table.find_all("th")]
-
-                for row in lot_rows[1:]:
-                    lot_row = [td.text.strip() for td in row.find_all("td")]  # Извлекаем текст ячеек
-                    lot_dict = dict(zip(headers, lot_row))
-                    lot = data.copy()
-                    lot_description = lot_dict.get("Описание", "").strip()
-                    classification_text = lot_dict.get("Тип", "").strip()
-                    if classification_text:
-                        mapped_category = determine_classification(classification_text)
-                        if mapped_category == "Не определена" and lot_description:
-                            mapped_category = determine_classification(lot_description)
-                    else:
-                        mapped_category = determine_classification(lot_description)
-
-                    lot.update({
-                        "Описание": lot_description if lot_description else "нету",
-                        "Классификация": mapped_category,
-                        "Цена": lot_dict.get("Стоимость,определеннаяоценщиком", "нету").strip()
-                    })
-                    messages.append(lot)
+        if "Сведения об объектах оценки" in sections:
+            messages += _lots(
+                backend, sections["Сведения об объектах оценки"], data, "Тип",
+                lambda lot_dict: lot_dict.get("Стоимость,определеннаяоценщиком", "нету").strip()
+            )
 
     return messages
+
+
+def parse_page(link, body, encoding, backend=None, window=None):
+    """
+    Точка входа для процессов разбора: раскодирует тело ответа и передаёт его в link_parser.
+    Функция и её результат (список Lot с общей шапкой или StalePage) пересылаются между процессами через pickle.
+    """
+    return link_parser(link, body.decode(encoding or "utf-8", errors="replace"), backend, window)
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# Модули бота лежат в корне репозитория, скрипты проверок и эталоны — в tools
+ROOT = Path(__file__).resolve().parent.parent
+TOOLS = ROOT / "tools"
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(TOOLS))
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+from classifier import UNDEFINED, Classifier, load_classifier, stem, tokenize
+
+CORPUS = Path(__file__).resolve().parent.parent / "tools" / "fixtures" / "lot_descriptions.txt"
+
+CATEGORIES = {
+    "Недвижимость": ["квартира", "земельный участок", "нежилое помещение"],
+    "Транспорт": ["автомобиль", "грузовик", "авто*"],
+    "Оборудование": ["станок", "оборудование"],
+}
+
+
+def test_stem_keeps_short_words():
+    assert stem("квартиры") == stem("квартира") == stem("квартирой")
+    assert stem("дом") == "дом"
+
+
+def test_tokenize_normalizes_case_and_yo():
+    assert tokenize("Ёлка ЁЛКИ") == tokenize("елка елки")
+
+
+def test_inflected_words_match():
+    classifier = Classifier(CATEGORIES)
+    assert classifier.classify("Продаётся квартиры в доме") == "Недвижимость"
+    assert classifier.classify("Грузовиком КАМАЗ") == "Транспорт"
+
+
+def test_phrase_scores_by_word_count():
+    classifier = Classifier(CATEGORIES)
+    assert classifier.scores("Земельный участок и станок") == {"Недвижимость": 2, "Оборудование": 1}
+    assert classifier.classify("Земельный участок и станок") == "Недвижимость"
+
+
+def test_prefix_keyword():
+    classifier = Classifier(CATEGORIES)
+    assert classifier.scores("Автокран и автовышка") == {"Транспорт": 2}
+
+
+def test_tie_goes_to_earlier_category():
+    classifier = Classifier(CATEGORIES)
+    assert classifier.classify("Станок и квартира") == "Недвижимость"
+    assert Classifier(dict(reversed(CATEGORIES.items()))).classify("Станок и квартира") == "Оборудование"
+
+
+def test_no_match():
+    assert Classifier(CATEGORIES).classify("Доля в уставном капитале") == UNDEFINED
+    assert Classifier({}).classify("квартира") == UNDEFINED
+
+
+def test_categories_file_on_corpus():
+    classifier = load_classifier()
+    lines = [line for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    results = {line: classifier.classify(line) for line in lines}
+    assert set(results.values()) <= set(classifier.categories) | {UNDEFINED}
+    assert results["Квартира, общая площадь 45,6 кв.м, кадастровый № 77:01:0001001:1234, г. Москва"] == "Недвижимость"
+    assert results["Прицеп тракторный 2ПТС-4, 1991 г.в."] == "Транспорт"
@@ -0,0 +1,86 @@
+import re
+from pathlib import Path
+
+import pytest
+
+from digest import build_digests, split_html, text_length
+from render import FORMATS, Announcement
+from sender import link_parser
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / "tools" / "fixtures"
+TAG_RE = re.compile(r"<(/?)(\w+)[^>]*>")
+
+
+def balanced(text):
+    """Все теги в тексте закрыты и вложены правильно."""
+    stack = []
+    for closing, tag in TAG_RE.findall(text):
+        if not closing:
+            stack.append(tag)
+        elif not stack or stack.pop() != tag:
+            return False
+    return not stack
+
+
+def test_text_length_counts_utf16_units():
+    assert text_length("abc") == 3
+    assert text_length("лот") == 3
+    assert text_length("📅") == 2
+
+
+def test_split_html_keeps_short_text():
+    assert split_html("<b>Лот 1</b>\nописание", 100) == ["<b>Лот 1</b>\nописание"]
+
+
+def test_split_html_splits_on_lines():
+    text = "\n".join(f"<b>Строка {n}</b>" for n in range(20))
+    pieces = split_html(text, 50)
+    assert all(text_length(piece) <= 50 and balanced(piece) for piece in pieces)
+    assert "\n".join(pieces) == text
+
+
+def test_split_html_cuts_long_line_without_breaking_entities():
+    line = "<b>" + "слово &amp; " * 30 + "</b>"
+    pieces = split_html(line, 40)
+    assert all(text_length(piece) <= 40 for piece in pieces)
+    assert all("<" not in piece for piece in pieces)
+    assert all(re.search(r"&(?!amp;)", piece) is None for piece in pieces)
+    assert "".join(pieces) == re.sub(r"</?b>", "", line)
+
+
+def test_build_digests_packs_whole_lots():
+    lots = [(n, f"<b>Лот {n}</b>\n" + "описание " * 20) for n in range(1, 11)]
+    digests = build_digests("ШАПКА", "ПРОДОЛЖЕНИЕ", lots, limit=700)
+    assert len(digests) > 1
+    assert digests[0][0].startswith("ШАПКА\n\n")
+    assert all(text.startswith("ПРОДОЛЖЕНИЕ\n\n") for text, _ in digests[1:])
+    assert all(text_length(text) <= 700 for text, _ in digests)
+    # Каждый лот целиком в одной сводке и ровно один раз
+    assert [lot_no for _, lot_nos in digests for lot_no in lot_nos] == list(range(1, 11))
+    for text, lot_nos in digests:
+        for lot_no in lot_nos:
+            assert dict(lots)[lot_no] in text
+
+
+def test_build_digests_splits_lot_longer_than_limit():
+    lots = [(1, "<b>Лот 1</b>\n" + "\n".join(["описание"] * 200)), (2, "<b>Лот 2</b>")]
+    digests = build_digests("ШАПКА", "ПРОДОЛЖЕНИЕ", lots, limit=300)
+    assert all(text_length(text) <= 300 for text, _ in digests)
+    assert digests[0][1] == [1]
+    assert digests[-1][1][-1] == 2
+
+
+@pytest.mark.parametrize("name", ["auction_large", "appraisal_large"])
+@pytest.mark.parametrize("format_name", sorted(FORMATS))
+def test_build_digests_on_fixture(name, format_name):
+    lots = link_parser(f"https://fedresurs.ru/bankruptmessages/{name}",
+                       (FIXTURES_DIR / f"{name}.html").read_text(encoding="utf-8"))
+    announcement = Announcement(lots)
+    message_format = FORMATS[format_name]
+    digests = build_digests(
+        announcement.header(len(lots), message_format),
+        announcement.continuation(message_format),
+        [(lot_no, announcement.lot(lot_no, message_format)) for lot_no in range(1, len(lots) + 1)]
+    )
+    assert all(text_length(text) <= 4096 and balanced(text) for text, _ in digests)
+    assert sorted(lot_no for _, lot_nos in digests for lot_no in lot_nos) == list(range(1, len(lots) + 1))
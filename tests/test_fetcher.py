@@ -0,0 +1,65 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+import fetcher
+from metrics import FETCH_RETRY_COUNT
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(fetcher, "FETCH_BACKOFF", 0)
+    monkeypatch.setattr(fetcher, "FETCH_RETRIES", 3)
+
+
+def fetch_from(statuses):
+    """Поднимает сервер, который отвечает статусами statuses по очереди, и качает с него страницу."""
+    calls = []
+
+    async def handler(request):
+        status = statuses[min(len(calls), len(statuses) - 1)]
+        calls.append(status)
+        return web.Response(status=status, text="<html>страница</html>", charset="utf-8")
+
+    async def run():
+        app = web.Application()
+        app.router.add_route("*", "/", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            async with fetcher.create_session() as session:
+                return await fetcher.fetch_page(session, f"http://127.0.0.1:{port}/")
+        finally:
+            await runner.cleanup()
+
+    return calls, run
+
+
+def test_retryable_status_is_retried():
+    retries = FETCH_RETRY_COUNT._default().value
+    calls, run = fetch_from([503, 200])
+    page = asyncio.run(run())
+    assert calls == [503, 200]
+    assert page.body.decode(page.encoding) == "<html>страница</html>"
+    assert FETCH_RETRY_COUNT._default().value == retries + 1
+
+
+def test_retryable_status_gives_up_after_last_attempt():
+    calls, run = fetch_from([503])
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        asyncio.run(run())
+    assert error.value.status == 503
+    assert len(calls) == 3
+
+
+def test_not_found_is_not_retried():
+    calls, run = fetch_from([404, 200])
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        asyncio.run(run())
+    assert error.value.status == 404
+    assert calls == [404]
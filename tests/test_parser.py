@@ -0,0 +1,33 @@
+import json
+import pickle
+
+import pytest
+
+from compare_parsers import EXPECTED_DIR, FIXTURES_DIR, as_items, fixture_link
+from sender import BACKENDS, link_parser, parse_page
+
+PAGES = sorted(path.stem for path in FIXTURES_DIR.glob("*.html"))
+
+
+def expected(name):
+    return [list(lot.items()) for lot in json.loads((EXPECTED_DIR / f"{name}.json").read_text(encoding="utf-8"))]
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+@pytest.mark.parametrize("name", PAGES)
+def test_parser_matches_golden(name, backend):
+    page = (FIXTURES_DIR / f"{name}.html").read_text(encoding="utf-8")
+    assert as_items(link_parser(fixture_link(name), page, backend=backend)) == expected(name)
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_parse_page_decodes_bytes(name):
+    path = FIXTURES_DIR / f"{name}.html"
+    lots = parse_page(fixture_link(name), path.read_bytes(), "utf-8")
+    assert as_items(lots) == expected(name)
+
+
+def test_lots_survive_pickling():
+    name = "auction_large"
+    lots = link_parser(fixture_link(name), (FIXTURES_DIR / f"{name}.html").read_text(encoding="utf-8"))
+    assert as_items(pickle.loads(pickle.dumps(lots))) == expected(name)
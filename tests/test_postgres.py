@@ -0,0 +1,57 @@
+"""
+Проверки на настоящем Postgres: параметры подключения — те же переменные окружения, что у бота
+(DB_HOST, DB_NAME, ...). Без них тесты пропускаются. Нужна тестовая база без неотправленных записей.
+"""
+import asyncio
+import subprocess
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+import db
+
+ROOT = Path(__file__).resolve().parent.parent
+TOOLS = ROOT / "tools"
+
+pytestmark = pytest.mark.skipif(not db.db_name, reason="база не настроена (DB_NAME)")
+
+
+def run_tool(*args, timeout=300):
+    result = subprocess.run(
+        [sys.executable, str(TOOLS / args[0]), *args[1:]], cwd=ROOT, capture_output=True, text=True, timeout=timeout
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+def test_workers_publish_each_lot_once():
+    assert "повторных публикаций нет" in run_tool("claim_stress.py", "3", "60")
+
+
+def test_listen_wakes_on_new_messages():
+    assert "оповещений: 5" in run_tool("listen_check.py", "5")
+
+
+def test_released_message_is_claimed_again():
+    async def run():
+        if await db.init_db_pool() is None:
+            pytest.fail("Не удалось подключиться к базе или применить миграции")
+        link = f"release_check/{uuid.uuid4()}"
+        message_id = await db.pool.fetchval(
+            "INSERT INTO messages (сообщение_ссылка, тип_сообщения) VALUES ($1, 'Аукцион') RETURNING id", link
+        )
+        lease_id, other = uuid.uuid4(), uuid.uuid4()
+        try:
+            claimed = [record async for record in db.fetch_unsent_links(lease_id) if record[1] == link]
+            assert claimed == [(message_id, link)]
+            # Пока аренда жива, запись не забирает никто другой
+            assert [record async for record in db.fetch_unsent_links(other) if record[1] == link] == []
+            assert await db.release_message(message_id, lease_id)
+            assert [record async for record in db.fetch_unsent_links(other) if record[1] == link] == claimed
+        finally:
+            await db.pool.execute("DELETE FROM messages WHERE id = $1", message_id)
+            await db.close_db_pool()
+
+    asyncio.run(run())
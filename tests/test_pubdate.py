@@ -0,0 +1,52 @@
+import datetime
+
+import pytest
+
+from pubdate import in_window, is_published_in_window, parse_date, parse_window
+
+D = datetime.date
+
+
+def test_parse_date():
+    assert parse_date("05.03.2026 12:40:00") == D(2026, 3, 5)
+    assert parse_date("Дата: 29.02.2024") == D(2024, 2, 29)
+    assert parse_date("31.02.2026") is None
+    assert parse_date("") is None
+    assert parse_date(None) is None
+
+
+def test_month_window():
+    window = parse_window("month")
+    assert window(D(2024, 2, 10)) == (D(2024, 2, 1), D(2024, 2, 29))
+    assert window(D(2026, 12, 31)) == (D(2026, 12, 1), D(2026, 12, 31))
+
+
+def test_days_window_includes_today():
+    assert parse_window("days:7")(D(2026, 3, 5)) == (D(2026, 2, 27), D(2026, 3, 5))
+    assert parse_window(" DAYS:1 ")(D(2026, 3, 5)) == (D(2026, 3, 5), D(2026, 3, 5))
+
+
+def test_range_window_with_open_bounds():
+    assert parse_window("range:2026-01-01..2026-03-31")(D(2030, 1, 1)) == (D(2026, 1, 1), D(2026, 3, 31))
+    assert parse_window("range:..2026-03-31")(D(2030, 1, 1)) == (D.min, D(2026, 3, 31))
+    assert parse_window("range:2026-01-01..")(D(2030, 1, 1)) == (D(2026, 1, 1), D.max)
+
+
+def test_all_window():
+    assert parse_window("all")(D(2026, 3, 5)) == (D.min, D.max)
+
+
+@pytest.mark.parametrize("spec", ["week", "days:0", "days:-1", "days:x", "range:2026-01-01", "range:2026-13-01.."])
+def test_invalid_window(spec):
+    with pytest.raises(ValueError):
+        parse_window(spec)
+
+
+def test_in_window():
+    window = (D(2026, 3, 1), D(2026, 3, 31))
+    assert in_window(D(2026, 3, 1), window)
+    assert in_window(D(2026, 3, 31), window)
+    assert not in_window(D(2026, 4, 1), window)
+    assert not in_window(None, window)
+    assert is_published_in_window({"Дата публикации": "15.03.2026"}, window)
+    assert not is_published_in_window({}, window)
@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+
+from bench_render import legacy
+from render import FORMATS, Announcement, Template, load_formats, parse_channel_formats
+from sender import link_parser
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / "tools" / "fixtures"
+PAGES = ["auction_small", "auction_large", "appraisal_small", "appraisal_large"]
+
+
+def fixture_lots(name):
+    return link_parser(f"https://fedresurs.ru/bankruptmessages/{name}",
+                       (FIXTURES_DIR / f"{name}.html").read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_full_format_matches_old_build_message(name):
+    lots = fixture_lots(name)
+    announcement = Announcement(lots)
+    assert [announcement.message(lot_no, FORMATS["full"]) for lot_no in range(1, len(lots) + 1)] == legacy(lots)
+
+
+def test_html_in_fields_is_escaped():
+    lot = {"Классификация": "A&B", "Описание": "<script>", "Ссылка": 'https://x/?a=1&b="2"'}
+    text = Announcement([lot]).message(1, FORMATS["full"])
+    assert "#A&amp;B" in text
+    assert "&lt;script&gt;" in text
+    assert 'href="https://x/?a=1&amp;b=&quot;2&quot;"' in text
+    assert legacy([lot]) == [text]
+
+
+def test_header_is_built_once_per_announcement():
+    announcement = Announcement(fixture_lots("auction_small"))
+    assert announcement.header(3) is announcement.header(3)
+    assert "3" in announcement.header(3)
+
+
+def test_unknown_field_is_rejected():
+    with pytest.raises(ValueError):
+        Template("bad", "{Нет такого поля}")
+    with pytest.raises(ValueError):
+        Template("bad", "{Цена!r}")
+
+
+def test_format_without_template_falls_back_to_default(tmp_path):
+    path = tmp_path / "templates.json"
+    path.write_text(
+        '{"full": {"message": "{Описание}", "header": "{Лотов}", "continuation": "...", "lot": "{Цена}"},'
+        ' "short": {"message": "{Цена}"}}',
+        encoding="utf-8"
+    )
+    formats = load_formats(path, "full")
+    assert formats["short"].lot is formats["full"].lot
+    announcement = Announcement([{"Описание": "описание", "Цена": "100"}])
+    assert announcement.message(1, formats["short"]) == "100"
+    assert announcement.lot(1, formats["short"]) == "100"
+
+
+def test_parse_channel_formats():
+    assert parse_channel_formats("@a=compact; @b = full ;мусор", FORMATS) == {"@a": "compact", "@b": "full"}
+    with pytest.raises(ValueError):
+        parse_channel_formats("@a=unknown", FORMATS)
@@ -0,0 +1,37 @@
+import pytest
+
+import routing
+from routing import parse_routes, resolve_destinations
+
+
+def test_parse_routes():
+    assert parse_routes("Недвижимость=@realty; Транспорт = @auto, @auto_backup ;Недвижимость=@realty2") == {
+        "Недвижимость": ["@realty", "@realty2"],
+        "Транспорт": ["@auto", "@auto_backup"],
+    }
+
+
+def test_parse_routes_skips_malformed_parts():
+    assert parse_routes("") == {}
+    assert parse_routes("без знака;=@chan;Пусто=;Пусто2= , ") == {}
+
+
+@pytest.fixture
+def routes(monkeypatch):
+    monkeypatch.setattr(routing, "ROUTES", parse_routes("Недвижимость=@realty,@all"))
+    monkeypatch.setattr(routing, "CHANNEL_ALL", "")
+    monkeypatch.setattr(routing, "CHANNEL_ID", "@default")
+
+
+def test_resolve_destinations(routes, monkeypatch):
+    assert resolve_destinations("Недвижимость") == ["@realty", "@all"]
+    # Без маршрута лот уходит в канал по умолчанию
+    assert resolve_destinations("Транспорт") == ["@default"]
+    monkeypatch.setattr(routing, "CHANNEL_ALL", "@all")
+    # CHANNEL_ALL добавляется без повторов и заменяет канал по умолчанию
+    assert resolve_destinations("Недвижимость") == ["@realty", "@all"]
+    assert resolve_destinations("Транспорт") == ["@all"]
+
+
+def test_all_channels(routes):
+    assert routing.all_channels() == ["@realty", "@all", "@default"]
@@ -0,0 +1,170 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter, TelegramServerError
+from aiogram.methods import SendMessage
+
+import scheduler
+from scheduler import CANCELLED, DEAD, DEFERRED, SENT, SendScheduler
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(scheduler, "SEND_RETRY_DELAY", 0)
+
+
+def run_job(errors, max_attempts=5):
+    """Отправляет одно сообщение; send сначала по очереди бросает errors, потом отвечает успехом."""
+    calls = []
+    marks = []
+
+    async def send(chat_id, text, reply_to):
+        calls.append(text)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return SimpleNamespace(message_id=100 + len(calls))
+
+    async def mark():
+        marks.append(len(calls))
+        return True
+
+    async def run():
+        sender = SendScheduler(send, global_rate=1000, chat_rate_per_minute=60000, chat_burst=1000,
+                               max_attempts=max_attempts)
+        future = await sender.submit("@chan", "текст", before_send=mark)
+        job = await future
+        await sender.close()
+        return job
+
+    return asyncio.run(run()), calls, marks
+
+
+def flood():
+    return TelegramRetryAfter(SendMessage(chat_id="@chan", text="текст"), "Too Many Requests", 0)
+
+
+def server_error():
+    return TelegramServerError(SendMessage(chat_id="@chan", text="текст"), "Bad Gateway")
+
+
+def test_flood_waits_do_not_use_up_attempts():
+    job, calls, marks = run_job([flood() for _ in range(8)])
+    assert job.status == SENT
+    assert len(calls) == 9
+    assert job.attempts == 1
+    assert job.flood_waits == 8
+    # Отметка о попытке ставится один раз, перед первым запросом
+    assert marks == [0]
+
+
+def test_server_errors_are_bounded():
+    job, calls, _ = run_job([server_error() for _ in range(10)], max_attempts=3)
+    assert job.status == DEAD
+    assert len(calls) == 3
+    assert job.attempts == 3
+
+
+def test_flood_waits_between_server_errors():
+    job, calls, _ = run_job([server_error(), flood(), flood(), server_error()], max_attempts=3)
+    assert job.status == SENT
+    assert len(calls) == 5
+    assert job.attempts == 3
+
+
+def test_reply_falls_back_to_standalone_text_when_parent_is_dead():
+    sent = []
+
+    async def send(chat_id, text, reply_to):
+        if text == "шапка":
+            raise RuntimeError("Bad Request: chat not found")
+        sent.append((text, reply_to))
+        return SimpleNamespace(message_id=len(sent))
+
+    async def run():
+        sender = SendScheduler(send, global_rate=1000, chat_rate_per_minute=60000, chat_burst=1000)
+        header = await sender.submit("@chan", "шапка")
+        reply = await sender.submit("@chan", "лот", header, standalone=lambda: "полный лот")
+        jobs = [await header, await reply]
+        await sender.close()
+        return jobs
+
+    header, reply = asyncio.run(run())
+    assert header.status == DEAD
+    assert reply.status == SENT
+    assert sent == [("полный лот", None)]
+
+
+def test_reply_keeps_short_text_when_parent_is_sent():
+    sent = []
+
+    async def send(chat_id, text, reply_to):
+        sent.append((text, reply_to))
+        return SimpleNamespace(message_id=len(sent))
+
+    async def run():
+        sender = SendScheduler(send, global_rate=1000, chat_rate_per_minute=60000, chat_burst=1000)
+        header = await sender.submit("@chan", "шапка")
+        reply = await sender.submit("@chan", "лот", header, standalone=lambda: "полный лот")
+        await reply
+        await sender.close()
+
+    asyncio.run(run())
+    assert sent == [("шапка", None), ("лот", 1)]
+
+
+@pytest.mark.parametrize("outcome", [False, RuntimeError("connection is closed")])
+def test_failed_checkpoint_cancels_without_sending(outcome):
+    calls = []
+
+    async def send(chat_id, text, reply_to):
+        calls.append(text)
+        return SimpleNamespace(message_id=1)
+
+    async def checkpoint():
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def run():
+        sender = SendScheduler(send, global_rate=1000, chat_rate_per_minute=60000, chat_burst=1000)
+        job = await (await sender.submit("@chan", "текст", before_send=checkpoint))
+        await sender.close()
+        return job
+
+    job = asyncio.run(run())
+    assert job.status == CANCELLED
+    assert calls == []
+
+
+def test_full_queue_defers_without_waiting():
+    sent = []
+    release = asyncio.Event()
+
+    async def send(chat_id, text, reply_to):
+        await release.wait()
+        sent.append((chat_id, text))
+        return SimpleNamespace(message_id=len(sent))
+
+    async def run():
+        sender = SendScheduler(send, global_rate=1000, chat_rate_per_minute=60000, chat_burst=1000, queue_size=1)
+        first = await sender.submit("@slow", "1", wait=False)
+        # Обработчик забрал первое сообщение и ждёт ответа Telegram, второе занимает очередь
+        await asyncio.sleep(0)
+        second = await sender.submit("@slow", "2", wait=False)
+        third = await asyncio.wait_for(sender.submit("@slow", "3", wait=False), 1)
+        other = await sender.submit("@fast", "4", wait=False)
+        assert third.done() and third.result().status == DEFERRED
+        assert sender.deferred_chats == {"@slow"}
+        drained = asyncio.create_task(sender.wait_deferred())
+        await asyncio.sleep(0.05)
+        assert not drained.done()
+        release.set()
+        await asyncio.wait_for(drained, 1)
+        jobs = [await first, await second, await other]
+        await sender.close()
+        return jobs
+
+    jobs = asyncio.run(run())
+    assert [job.status for job in jobs] == [SENT, SENT, SENT]
+    assert sorted(sent) == [("@fast", "4"), ("@slow", "1"), ("@slow", "2")]
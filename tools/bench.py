@@ -0,0 +1,300 @@
+"""
+Офлайн-бенчмарк бота: без fedresurs и без настоящего Telegram.
+
+Режим parse — прогон сохранённых страниц ЕФРСБ (по умолчанию tools/fixtures/*.html:
+объявления о торгах и отчёты оценщика, с маленькими и очень большими таблицами лотов)
+через sender.parse_page и render.Announcement.
+
+Режим full (по умолчанию) — весь путь бота. В локальный Postgres (переменные DB_HOST, DB_NAME, ...)
+добавляются N записей messages со ссылками на локальный сервер, который отдаёт эти страницы,
+и main.process_unsent_links проводит их через аренду, загрузку, разбор в пуле процессов,
+журнал доставки и очереди отправки в подставной Bot API. Подставной Bot API через каждые
+--flood-every запросов отвечает 429 с retry_after, как flood control Telegram.
+После прогона тестовые записи удаляются.
+
+Отчёт: страниц/с, лотов/с, p50/p99 задержки (от выдачи записи из базы до ответа Bot API
+на каждое сообщение, для full; время разбора страницы, для parse) и пиковый RSS процесса
+и процессов разбора. С --json отчёт дописывается строкой в файл, чтобы сравнивать прогоны.
+
+    python tools/bench.py parse [--repeat 20]
+    python tools/bench.py full [--rows 50] [--workers 2] [--flood-every 500] [--mode lots]
+"""
+import argparse
+import asyncio
+import datetime
+import html
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+sys.path.insert(0, str(ROOT))
+
+LINK_PREFIX = "/bench/"
+HREF_RE = re.compile(r'href="([^"]+)"')
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def peak_rss_mb():
+    """Пиковый RSS процесса и пиковый RSS среди завершившихся дочерних процессов, МБ."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return round(own, 1), round(children, 1)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_pages(pages_dir):
+    pages = {path.stem: path.read_bytes() for path in sorted(Path(pages_dir).glob("*.html"))}
+    if not pages:
+        sys.exit(f"В {pages_dir} нет страниц *.html")
+    return pages
+
+
+def bench_parse(args):
+    from render import Announcement
+    from sender import parse_page
+
+    pages = load_pages(args.pages)
+    timings = []
+    lots_total = 0
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for name, body in pages.items():
+            page_started = time.perf_counter()
+            lots = parse_page(f"https://example.invalid/{name}", body, "utf-8")
+            announcement = Announcement(lots)
+            for lot_no in range(1, len(lots) + 1):
+                announcement.message(lot_no)
+            timings.append(time.perf_counter() - page_started)
+            lots_total += len(lots)
+    elapsed = time.perf_counter() - started
+    return {
+        "pages": len(timings),
+        "lots": lots_total,
+        "seconds": round(elapsed, 3),
+        "pages_per_s": round(len(timings) / elapsed, 1),
+        "lots_per_s": round(lots_total / elapsed, 1),
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 2),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 2),
+    }
+
+
+class FakeServers:
+    """Локальные подставные ЕФРСБ (страницы из каталога) и Telegram Bot API."""
+
+    def __init__(self, pages, flood_every, retry_after):
+        self.pages = pages
+        self.flood_every = flood_every
+        self.retry_after = retry_after
+        self.requests = 0
+        self.floods = 0
+        # Успешно опубликованные сообщения
+        self.posted = 0
+        # Время ответа на каждое опубликованное сообщение по ссылке записи
+        self.sent = {}
+        self.runner = None
+        self.base = None
+
+    async def efrsb_page(self, request):
+        return web.Response(body=self.pages[request.match_info["name"]], content_type="text/html", charset="utf-8")
+
+    async def send_message(self, request):
+        form = await request.post()
+        self.requests += 1
+        if self.flood_every and self.requests % self.flood_every == 0:
+            self.floods += 1
+            return web.json_response({
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            })
+        self.posted += 1
+        match = HREF_RE.search(form.get("text", ""))
+        if match:
+            self.sent.setdefault(html.unescape(match.group(1)), []).append(time.perf_counter())
+        return web.json_response({"ok": True, "result": {
+            "message_id": self.requests, "date": int(time.time()),
+            "chat": {"id": -1000000000000 - abs(hash(form.get("chat_id"))) % 10 ** 9, "type": "channel"},
+            "text": form.get("text", ""),
+        }})
+
+    async def start(self):
+        app = web.Application(client_max_size=1024 ** 2)
+        app.router.add_get(LINK_PREFIX + "{name}", self.efrsb_page)
+        app.router.add_post(LINK_PREFIX + "{name}", self.efrsb_page)
+        app.router.add_post("/bot{token}/sendMessage", self.send_message)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+async def seed(db, base, pages, rows):
+    unsent = await db.pool.fetchval(
+        '''
+        SELECT count(*) FROM messages
+        WHERE send_to_channel = FALSE AND тип_сообщения IN ('Аукцион', 'Публичка', 'Отчет оценщика')
+        '''
+    )
+    if unsent:
+        sys.exit(f"В messages уже есть {unsent} неотправленных записей — нужна тестовая база")
+    names = list(pages)
+    links = [f"{base}{LINK_PREFIX}{names[i % len(names)]}?n={i}" for i in range(rows)]
+    ids = await db.pool.fetch(
+        '''
+        INSERT INTO messages (сообщение_ссылка, тип_сообщения, send_to_channel)
+        SELECT link, 'Аукцион', FALSE FROM unnest($1::text[]) AS link
+        RETURNING id
+        ''',
+        links
+    )
+    return [row["id"] for row in ids]
+
+
+async def cleanup(db, ids):
+    await db.pool.execute("DELETE FROM lot_deliveries WHERE message_id = ANY($1)", ids)
+    await db.pool.execute("DELETE FROM messages WHERE id = ANY($1)", ids)
+
+
+async def bench_full(args):
+    pages = load_pages(args.pages)
+    servers = FakeServers(pages, args.flood_every, args.retry_after)
+    await servers.start()
+
+    # Настройки должны попасть в окружение до импорта модулей бота
+    os.environ.update(
+        BOT_TOKEN="123456:bench",
+        TELEGRAM_API_URL=servers.base,
+        CHANNEL_ID="@bench",
+        CHANNEL_ROUTES="Недвижимость=@bench_realty;Транспорт=@bench_auto",
+        CHANNEL_ALL="",
+        PARSE_WORKERS=str(args.workers),
+        PAGE_CACHE_DIR="",
+        METRICS_PORT="0",
+        SEND_MODE=args.mode,
+        SEND_SHARED_BUDGET="0",
+        SEND_GLOBAL_RATE=str(args.send_rate),
+        SEND_CHAT_RATE_PER_MINUTE=str(args.send_rate * 60),
+        SEND_CHAT_BURST=str(args.send_rate),
+        # Замеряется один проход: лоты не должны откладываться из-за заполненной очереди канала
+        SEND_QUEUE_SIZE="1000000",
+        # Даты в фикстурах фиксированы, окно публикации не должно их отсекать
+        PUBLICATION_WINDOW="all",
+    )
+    import db
+    import main
+    import metrics
+    import pipeline
+
+    if await db.init_db_pool() is None or not await db.apply_migrations():
+        sys.exit("Не удалось подключиться к базе или применить миграции")
+    ids = await seed(db, servers.base, pages, args.rows)
+
+    claimed_at = {}
+    fetch_unsent_links = db.fetch_unsent_links
+
+    async def timed_fetch_unsent_links(*fetch_args, **fetch_kwargs):
+        async for message_id, link in fetch_unsent_links(*fetch_args, **fetch_kwargs):
+            claimed_at[link] = time.perf_counter()
+            yield message_id, link
+
+    main.fetch_unsent_links = timed_fetch_unsent_links
+    main.acks.start()
+    started = time.perf_counter()
+    try:
+        await main.process_unsent_links()
+        # Проход не ждёт очередей каналов, а замер — до последнего отправленного лота
+        await main.finish_sending()
+        elapsed = time.perf_counter() - started
+        acked = await db.pool.fetchval("SELECT count(*) FROM messages WHERE id = ANY($1) AND send_to_channel", ids)
+    finally:
+        await main.scheduler.close()
+        await main.acks.close()
+        await cleanup(db, ids)
+        await db.close_db_pool()
+        await main.bot.session.close()
+        await servers.stop()
+        pool = pipeline.get_parse_pool()
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    latencies = [
+        sent_at - claimed_at[link]
+        for link, times in servers.sent.items() if link in claimed_at
+        for sent_at in times
+    ]
+    lots = sum(child.value for child in metrics.LOTS._children.values())
+    return {
+        "rows": args.rows,
+        "acked": acked,
+        "lots": lots,
+        "messages": len(latencies),
+        "flood_429": servers.floods,
+        "seconds": round(elapsed, 3),
+        "pages_per_s": round(args.rows / elapsed, 1),
+        "lots_per_s": round(lots / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк разбора и отправки")
+    parser.add_argument("scenario", nargs="?", choices=["full", "parse"], default="full")
+    parser.add_argument("--pages", default=str(FIXTURES_DIR), help="каталог с сохранёнными страницами *.html")
+    parser.add_argument("--repeat", type=int, default=20, help="parse: сколько раз прогнать каталог")
+    parser.add_argument("--rows", type=int, default=50, help="full: сколько записей добавить в messages")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="full: PARSE_WORKERS")
+    parser.add_argument("--mode", choices=["lots", "digest", "thread"], default="lots", help="full: SEND_MODE")
+    parser.add_argument("--send-rate", type=int, default=1000, help="full: лимит отправки, сообщений/с")
+    parser.add_argument("--flood-every", type=int, default=500, help="full: 429 на каждый N-й запрос, 0 — никогда")
+    parser.add_argument("--retry-after", type=int, default=1, help="full: retry_after в ответе 429, с")
+    parser.add_argument("--json", help="дописать отчёт строкой JSON в этот файл")
+    args = parser.parse_args()
+
+    if args.scenario == "parse":
+        report = bench_parse(args)
+    else:
+        report = asyncio.run(bench_full(args))
+    report["rss_mb"], report["children_rss_mb"] = peak_rss_mb()
+    report = {
+        "scenario": args.scenario,
+        "revision": git_revision(),
+        "at": datetime.datetime.now().isoformat(timespec="seconds"),
+        **report,
+    }
+    for key, value in report.items():
+        print(f"{key:>16}: {value}")
+    if args.json:
+        with open(args.json, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Микробенчмарк классификатора лотов на корпусе описаний tools/fixtures/lot_descriptions.txt.
+
+Сравнивает прежний перебор ключевых слов ("keyword in text" по всем категориям по очереди)
+с classifier.Classifier на словаре categories.json и на том же словаре, раздутом
+синтетическими терминами до нескольких тысяч, и печатает, сколько категорий изменилось.
+
+    python tools/bench_classifier.py [раздуть_до_терминов]
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from classifier import CATEGORIES_FILE, UNDEFINED, Classifier  # noqa: E402
+
+CORPUS = Path(__file__).resolve().parent / "fixtures" / "lot_descriptions.txt"
+ROUNDS = 200
+
+
+def naive_classify(categories, description):
+    desc_lower = description.lower()
+    for category, keywords in categories.items():
+        for keyword in keywords:
+            if keyword.rstrip("*") in desc_lower:
+                return category
+    return UNDEFINED
+
+
+def inflate(categories, terms):
+    # Синтетические термины, которые в корпусе не встречаются: важна только их стоимость
+    inflated = {category: list(keywords) for category, keywords in categories.items()}
+    names = list(inflated)
+    for n in range(terms):
+        inflated[names[n % len(names)]].append(f"термин{n} изделие{n % 97}")
+    return inflated
+
+
+def measure(classify, corpus):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for description in corpus:
+            classify(description)
+    return (time.perf_counter() - started) / (ROUNDS * len(corpus)) * 1e6
+
+
+def main(terms):
+    corpus = [line.strip() for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    categories = json.loads(Path(CATEGORIES_FILE).read_text(encoding="utf-8"))
+    inflated = inflate(categories, terms)
+    size = sum(len(keywords) for keywords in categories.values())
+
+    for title, dictionary in ((f"{size} терминов", categories), (f"{size + terms} терминов", inflated)):
+        engine = Classifier(dictionary)
+        naive = measure(lambda text: naive_classify(dictionary, text), corpus)
+        compiled = measure(engine.classify, corpus)
+        print(f"{title:>16}: перебор {naive:7.1f} мкс/лот, Classifier {compiled:6.1f} мкс/лот")
+
+    engine = Classifier(categories)
+    changed = [
+        (text, naive_classify(categories, text), engine.classify(text))
+        for text in corpus
+        if naive_classify(categories, text) != engine.classify(text)
+    ]
+    print(f"Категория изменилась у {len(changed)} из {len(corpus)} описаний:")
+    for text, old, new in changed:
+        print(f"  {old} -> {new}: {text}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,106 @@
+"""
+Микробенчмарк сборки текстов сообщений на объявлении из tools/fixtures (по умолчанию
+auction_large — 300 лотов).
+
+Сравнивает прежнюю сборку каждого лота одной f-строкой (вся шапка заново экранируется
+на каждый лот) с render.Announcement во всех форматах из templates.json: время на объявление,
+на лот и сколько памяти выделяется на объявление. Проверяет, что формат по умолчанию
+даёт ровно те же тексты, что и прежняя f-строка.
+
+    python tools/bench_render.py [имя_фикстуры]
+"""
+import html
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from render import FORMATS, MESSAGE_FORMAT, Announcement, short_description  # noqa: E402
+from sender import link_parser  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+ROUNDS = 50
+
+
+def legacy_arbiter_info(data):
+    au_info = data.get('Арбитражный управляющий', '').strip()
+    if not au_info or au_info == 'Неизвестно':
+        au_info = data.get('Организатор торгов', 'Неизвестно').strip()
+    if au_info and au_info != 'Неизвестно':
+        fio_au = au_info.split(' (ИНН')[0] if ' (ИНН' in au_info else au_info
+        match = re.search(r'ИНН[:\s]*(\d+)', au_info)
+        inn = match.group(1) if match else 'Неизвестно'
+    else:
+        fio_au = inn = 'Неизвестно'
+    return fio_au, inn
+
+
+def legacy_build_message(data):
+    description = short_description(data)
+    fio_au, inn = legacy_arbiter_info(data)
+    return (
+        f"#{html.escape(data.get('Классификация', 'Без категории'))}\n\n"
+        f"📅 <b>Дата публикации:</b> {html.escape(data.get('Дата публикации', 'Не указана'))}\n"
+        f"🏷️ <b>Формат торгов:</b> {html.escape(data.get('Вид торгов', 'Не указан'))}\n\n"
+        f"📝 <b>Описание:</b> {html.escape(description)}\n\n"
+        f"💰 <b>Цена:</b> {html.escape(data.get('Цена', 'Не указана'))}\n\n"
+        f"👨‍💼 <b>Арбитражный управляющий:</b>\n"
+        f"ФИО: {html.escape(fio_au)}\n"
+        f"ИНН: {html.escape(inn)}\n"
+        f"Телефон: отсутствует\n"
+        f"E-mail: {html.escape(data.get('E-mail', 'отсутствует'))}\n\n"
+        f"🏢 <b>Должник:</b>\n"
+        f"Наименование: {html.escape(data.get('ФИО должника', 'Не указано'))}\n"
+        f"ИНН: {html.escape(data.get('ИНН', 'Не указан'))}\n\n"
+        f"🔗 <a href=\"{html.escape(data.get('Ссылка', '#'))}\">Открыть сообщение</a>"
+    )
+
+
+def legacy(lots):
+    return [legacy_build_message(lot) for lot in lots]
+
+
+def rendered(lots, message_format):
+    announcement = Announcement(lots)
+    return [announcement.message(lot_no, message_format) for lot_no in range(1, len(lots) + 1)]
+
+
+def measure(render_all, lots):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        render_all(lots)
+    elapsed = (time.perf_counter() - started) / ROUNDS
+    tracemalloc.start()
+    render_all(lots)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(name):
+    path = FIXTURES_DIR / f"{name}.html"
+    lots = link_parser(f"https://fedresurs.ru/bankruptmessages/{name}", path.read_text(encoding="utf-8"))
+    if not lots:
+        sys.exit(f"В {path} нет лотов")
+    print(f"{name}: {len(lots)} лотов, {ROUNDS} прогонов")
+
+    rows = [("f-строка", lambda items: legacy(items))]
+    rows += [(f"шаблон {fmt}", lambda items, fmt=fmt: rendered(items, FORMATS[fmt])) for fmt in FORMATS]
+    for title, render_all in rows:
+        elapsed, peak = measure(render_all, lots)
+        print(f"{title:>16}: {elapsed * 1000:7.2f} мс/объявление, {elapsed / len(lots) * 1e6:6.1f} мкс/лот, "
+              f"пик памяти {peak / 1024:7.1f} КБ")
+
+    if rendered(lots, FORMATS[MESSAGE_FORMAT]) != legacy(lots):
+        sys.exit(f"ОШИБКА: формат {MESSAGE_FORMAT} отличается от прежних текстов")
+    announcement = Announcement(lots)
+    if announcement.header(len(lots)) is not announcement.header(len(lots)):
+        sys.exit("ОШИБКА: шапка собирается заново на каждый вызов")
+    print(f"Формат {MESSAGE_FORMAT} совпадает с прежними текстами, шапка собирается один раз на объявление")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "auction_large")
@@ -0,0 +1,58 @@
+"""
+Сравнивает режимы публикации (digest.SEND_MODE) на объявлениях из tools/fixtures:
+сколько сообщений Telegram уходит на одно объявление в один канал и сколько времени
+это занимает при лимите канала SEND_CHAT_RATE_PER_MINUTE с запасом SEND_CHAT_BURST.
+Заодно проверяет, что каждая сводка не длиннее DIGEST_LIMIT и что каждый лот попал ровно в одну.
+
+    python tools/bench_send_modes.py
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+sys.path.insert(0, str(ROOT))
+
+from digest import DIGEST_LIMIT, DIGEST_THRESHOLD, build_digests, text_length  # noqa: E402
+from render import Announcement  # noqa: E402
+from scheduler import SEND_CHAT_BURST, SEND_CHAT_RATE_PER_MINUTE  # noqa: E402
+from sender import link_parser  # noqa: E402
+
+
+def publish_time(messages):
+    """Секунды на публикацию messages сообщений в один канал: запас уходит сразу, остальное по лимиту."""
+    return max(0, messages - SEND_CHAT_BURST) * 60 / SEND_CHAT_RATE_PER_MINUTE
+
+
+def count_messages(lots):
+    """Число сообщений на объявление в режимах lots, digest и thread."""
+    if len(lots) <= DIGEST_THRESHOLD:
+        return len(lots), len(lots), len(lots)
+    announcement = Announcement(lots)
+    digests = build_digests(
+        announcement.header(len(lots)),
+        announcement.continuation(),
+        [(lot_no, announcement.lot(lot_no)) for lot_no in range(1, len(lots) + 1)]
+    )
+    too_long = [text_length(text) for text, _ in digests if text_length(text) > DIGEST_LIMIT]
+    if too_long:
+        sys.exit(f"ОШИБКА: сводки длиннее {DIGEST_LIMIT}: {too_long}")
+    packed = [lot_no for _, lot_nos in digests for lot_no in lot_nos]
+    if sorted(packed) != list(range(1, len(lots) + 1)):
+        sys.exit("ОШИБКА: лоты попали в сводки не по одному разу")
+    return len(lots), len(digests), len(lots) + 1
+
+
+def main():
+    print(f"порог {DIGEST_THRESHOLD} лотов, лимит канала {SEND_CHAT_RATE_PER_MINUTE:g}/мин, запас {SEND_CHAT_BURST:g}")
+    print(f"{'объявление':<18}{'лотов':>6}  {'lots':>14}  {'digest':>14}  {'thread':>14}")
+    for path in sorted(FIXTURES_DIR.glob("*.html")):
+        lots = link_parser(f"https://example.invalid/{path.stem}", path.read_text(encoding="utf-8"))
+        if not lots:
+            continue
+        cells = [f"{count:4} / {publish_time(count):5.0f} с" for count in count_messages(lots)]
+        print(f"{path.stem:<18}{len(lots):>6}  " + "  ".join(f"{cell:>14}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
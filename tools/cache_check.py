@@ -0,0 +1,134 @@
+"""
+Проверка кэша страниц (pagecache) на страницах из tools/fixtures.
+
+Поднимает локальный сервер, который отдаёт фикстуры как страницы ЕФРСБ (с ETag и 304
+на условный GET), и прогоняет через pipeline.run_pipeline одни и те же записи несколько раз:
+холодный кэш, свежий кэш, перепроверку после TTL методом POST (по хешу тела) и GET (304),
+и изменение страницы. Для каждого прохода печатает число запросов к серверу, разборов и время.
+
+    python tools/cache_check.py [повторов каждой страницы]
+"""
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+sys.path.insert(0, str(ROOT))
+
+# Настройки должны попасть в окружение до импорта модулей бота
+os.environ.update(
+    PAGE_CACHE_DIR=tempfile.mkdtemp(prefix="page_cache_"),
+    PARSE_WORKERS="0",
+    FETCH_RETRIES="1",
+)
+
+import fetcher  # noqa: E402
+import pagecache  # noqa: E402
+import pipeline  # noqa: E402
+
+PAGES = {path.stem: path.read_bytes() for path in sorted(FIXTURES_DIR.glob("*.html"))}
+hits = {"requests": 0, "not_modified": 0, "parses": 0}
+
+
+async def serve_page(request):
+    hits["requests"] += 1
+    body = PAGES[request.match_info["name"]]
+    etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+    if request.method == "GET" and request.headers.get("If-None-Match") == etag:
+        hits["not_modified"] += 1
+        return web.Response(status=304, headers={"ETag": etag})
+    return web.Response(body=body, content_type="text/html", charset="utf-8", headers={"ETag": etag})
+
+
+def counting_parse(*args, **kwargs):
+    hits["parses"] += 1
+    return parse_page(*args, **kwargs)
+
+
+parse_page = pipeline.parse_page
+pipeline.parse_page = counting_parse
+
+
+async def run_pass(title, base, copies):
+    for key in hits:
+        hits[key] = 0
+    received = []
+
+    async def records():
+        number = 0
+        for name in PAGES:
+            for copy in range(copies):
+                number += 1
+                yield number, f"{base}/{name}?copy={copy}"
+
+    async def handle_parsed(message_id, link, messages):
+        received.append(len(messages))
+
+    started = time.perf_counter()
+    await pipeline.run_pipeline(records(), handle_parsed)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{title:<34} записей {len(received):4}, лотов {sum(received):6}, "
+        f"запросов {hits['requests']:4} (304: {hits['not_modified']:4}), разборов {hits['parses']:4}, "
+        f"{elapsed * 1000:7.0f} мс"
+    )
+    return dict(hits, records=len(received), lots=sum(received))
+
+
+async def main(copies):
+    app = web.Application()
+    app.router.add_route("*", "/{name}", serve_page)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+    total = len(PAGES) * copies
+    failed = []
+
+    try:
+        cold = await run_pass("холодный кэш", base, copies)
+        if cold["requests"] != total or cold["parses"] != total:
+            failed.append("холодный проход должен скачать и разобрать все страницы")
+
+        warm = await run_pass("свежий кэш", base, copies)
+        if warm["requests"] or warm["parses"] or warm["lots"] != cold["lots"]:
+            failed.append("свежие страницы не должны скачиваться и разбираться")
+
+        pagecache.get_page_cache().ttl = 0
+        fetcher.FETCH_METHOD = "POST"
+        post = await run_pass("после TTL, POST (хеш тела)", base, copies)
+        if post["requests"] != total or post["parses"] or post["lots"] != cold["lots"]:
+            failed.append("неизменившиеся страницы не должны разбираться заново")
+
+        fetcher.FETCH_METHOD = "GET"
+        get = await run_pass("после TTL, GET (ETag)", base, copies)
+        if get["not_modified"] != total or get["parses"]:
+            failed.append("условный GET должен получать 304 и не разбирать страницы")
+
+        name = next(iter(PAGES))
+        PAGES[name] = PAGES[name].replace(b"</body>", b"<!-- changed --></body>")
+        changed = await run_pass("одна страница изменилась", base, copies)
+        if changed["parses"] != copies:
+            failed.append("изменившаяся страница должна разбираться заново")
+    finally:
+        pagecache.close_page_cache()
+        await runner.cleanup()
+
+    if failed:
+        for message in failed:
+            print(f"ОШИБКА: {message}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
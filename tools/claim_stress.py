@@ -0,0 +1,189 @@
+"""
+Проверка аренды записей несколькими воркерами на локальном Postgres.
+
+Запускает N процессов, каждый из которых, как main.process_unsent_links, забирает записи
+через db.fetch_unsent_links и отправляет их лоты через main.handle_parsed. Вместо Telegram
+и ЕФРСБ — подставные лоты и отправка в таблицу claim_stress_posts. Один воркер ведёт себя
+как зависший: забирает страницу и молчит дольше срока аренды, а потом всё равно пытается
+её отправить. В конце проверяется, что каждая пара (лот, канал) опубликована ровно один раз
+и все записи подтверждены.
+
+Параметры подключения — те же переменные окружения, что у бота (DB_HOST, DB_NAME, ...).
+Скрипт отказывается работать, если в messages уже есть неотправленные записи.
+
+    python tools/claim_stress.py [воркеров] [записей]
+"""
+import asyncio
+import datetime
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+LINK_PREFIX = "claim_stress/"
+LOTS_PER_MESSAGE = 2
+LEASE_SECONDS = 3
+
+# Настройки должны попасть в окружение до импорта модулей бота
+os.environ.update(
+    BOT_TOKEN=os.getenv("BOT_TOKEN", "123456:claim-stress"),
+    CHANNEL_ID="@claim_stress",
+    CHANNEL_ROUTES="",
+    CHANNEL_ALL="",
+    DB_PAGE_SIZE="5",
+    LEASE_SECONDS=str(LEASE_SECONDS),
+    ACK_FLUSH_INTERVAL="0.2",
+    SEND_GLOBAL_RATE="500",
+    SEND_CHAT_RATE_PER_MINUTE="30000",
+    SEND_CHAT_BURST="50",
+)
+
+import db  # noqa: E402
+
+
+def fake_lots(link):
+    today = datetime.date.today().strftime("%d.%m.%Y")
+    return [
+        {"Ссылка": link, "Дата публикации": today, "Классификация": "Недвижимость", "Описание": f"{link} лот {n}"}
+        for n in range(1, LOTS_PER_MESSAGE + 1)
+    ]
+
+
+async def remaining():
+    return await db.pool.fetchval(
+        "SELECT count(*) FROM messages WHERE сообщение_ссылка LIKE $1 AND send_to_channel = FALSE",
+        LINK_PREFIX + "%"
+    )
+
+
+async def run_worker(number, stall):
+    import main
+
+    async def send(chat_id, text, reply_to=None):
+        message_id = await db.pool.fetchval(
+            "INSERT INTO claim_stress_posts (chat_id, text, worker) VALUES ($1, $2, $3) RETURNING id",
+            chat_id, text, number
+        )
+        return SimpleNamespace(message_id=message_id)
+
+    main.scheduler.send = send
+    await db.init_db_pool()
+    main.acks.start()
+    heartbeat = None if stall else asyncio.create_task(main.renew_leases())
+    try:
+        stalled = False
+        # Как основной цикл бота: проходы повторяются, пока есть неподтверждённые тестовые записи
+        while await remaining():
+            async for message_id, link in db.fetch_unsent_links(main.LEASE_ID):
+                if stall and not stalled:
+                    # Аренда истекает, записи забирают другие воркеры, а этот потом просыпается
+                    stalled = True
+                    await asyncio.sleep(LEASE_SECONDS * 2)
+                await main.handle_parsed(message_id, link, fake_lots(link))
+            await main.finish_sending()
+            await asyncio.sleep(0.5)
+        await main.scheduler.close()
+        await main.acks.close()
+    finally:
+        if heartbeat is not None:
+            heartbeat.cancel()
+        await db.close_db_pool()
+        await main.bot.session.close()
+
+
+def worker_process(number, stall):
+    asyncio.run(run_worker(number, stall))
+
+
+async def prepare(rows):
+    if await db.init_db_pool() is None or not await db.apply_migrations():
+        sys.exit("Не удалось подключиться к базе или применить миграции")
+    unsent = await db.pool.fetchval(
+        '''
+        SELECT count(*) FROM messages
+        WHERE send_to_channel = FALSE AND тип_сообщения IN ('Аукцион', 'Публичка', 'Отчет оценщика')
+        '''
+    )
+    if unsent:
+        sys.exit(f"В messages уже есть {unsent} неотправленных записей — нужна тестовая база")
+    await db.pool.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS claim_stress_posts (
+            id BIGSERIAL PRIMARY KEY, chat_id TEXT NOT NULL, text TEXT NOT NULL, worker INTEGER NOT NULL
+        );
+        TRUNCATE claim_stress_posts;
+        '''
+    )
+    ids = await db.pool.fetch(
+        '''
+        INSERT INTO messages (сообщение_ссылка, тип_сообщения, send_to_channel)
+        SELECT $1 || g, 'Аукцион', FALSE FROM generate_series(1, $2) g
+        RETURNING id
+        ''',
+        LINK_PREFIX, rows
+    )
+    await db.close_db_pool()
+    return [row['id'] for row in ids]
+
+
+async def verify_and_cleanup(ids):
+    await db.init_db_pool()
+    try:
+        duplicates = await db.pool.fetch(
+            "SELECT chat_id, text, count(*) AS posts FROM claim_stress_posts GROUP BY 1, 2 HAVING count(*) > 1"
+        )
+        posts = await db.pool.fetch("SELECT worker, count(*) AS posts FROM claim_stress_posts GROUP BY 1 ORDER BY 1")
+        unacked = await db.pool.fetchval(
+            "SELECT count(*) FROM messages WHERE id = ANY($1) AND send_to_channel = FALSE", ids
+        )
+        return duplicates, posts, unacked
+    finally:
+        await db.pool.execute("DELETE FROM lot_deliveries WHERE message_id = ANY($1)", ids)
+        await db.pool.execute("DELETE FROM messages WHERE id = ANY($1)", ids)
+        await db.pool.execute("DROP TABLE claim_stress_posts")
+        await db.close_db_pool()
+
+
+def main(workers, rows):
+    ids = asyncio.run(prepare(rows))
+    started = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=worker_process, args=(number, number == 0)) for number in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    duplicates, posts, unacked = asyncio.run(verify_and_cleanup(ids))
+    total = sum(row['posts'] for row in posts)
+    print(f"воркеров: {workers}, записей: {rows}, публикаций: {total} за {elapsed:.1f} с")
+    print("по воркерам: " + ", ".join(f"#{row['worker']}: {row['posts']}" for row in posts))
+    failed = False
+    if duplicates:
+        failed = True
+        print(f"ОШИБКА: {len(duplicates)} пар опубликованы больше одного раза")
+    if total != rows * LOTS_PER_MESSAGE:
+        failed = True
+        print(f"ОШИБКА: ожидалось {rows * LOTS_PER_MESSAGE} публикаций")
+    if unacked:
+        failed = True
+        print(f"ОШИБКА: {unacked} записей не подтверждены")
+    if any(process.exitcode for process in processes):
+        failed = True
+        print("ОШИБКА: не все воркеры завершились успешно")
+    if failed:
+        sys.exit(1)
+    print("OK: повторных публикаций нет")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 4,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+    )
@@ -0,0 +1,63 @@
+"""
+Сверяет все доступные движки sender.link_parser с эталонным результатом разбора
+страниц из tools/fixtures и печатает время разбора каждой страницы.
+
+    python tools/compare_parsers.py           # сверка и замер
+    python tools/compare_parsers.py --update  # пересоздать эталон движком bs4
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sender import BACKENDS, link_parser  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+EXPECTED_DIR = FIXTURES_DIR / "expected"
+REPEAT = 5
+
+
+def fixture_link(name):
+    return f"https://old.bankrot.fedresurs.ru/MessageWindow.aspx?ID={name}"
+
+
+def as_items(lots):
+    # Сравниваем и значения, и порядок ключей
+    return [list(dict(lot).items()) for lot in lots]
+
+
+def main(update):
+    pages = sorted(FIXTURES_DIR.glob("*.html"))
+    if update:
+        EXPECTED_DIR.mkdir(exist_ok=True)
+        for path in pages:
+            lots = link_parser(fixture_link(path.stem), path.read_text(encoding="utf-8"), backend="bs4")
+            (EXPECTED_DIR / f"{path.stem}.json").write_text(
+                json.dumps([dict(lot) for lot in lots], ensure_ascii=False, indent=1), encoding="utf-8"
+            )
+        print(f"Эталон обновлён: {len(pages)} страниц")
+        return
+
+    failed = False
+    for path in pages:
+        page = path.read_text(encoding="utf-8")
+        expected = json.loads((EXPECTED_DIR / f"{path.stem}.json").read_text(encoding="utf-8"))
+        expected = [list(lot.items()) for lot in expected]
+        timings = []
+        for name in BACKENDS:
+            started = time.perf_counter()
+            for _ in range(REPEAT):
+                lots = link_parser(fixture_link(path.stem), page, backend=name)
+            timings.append(f"{name} {(time.perf_counter() - started) / REPEAT * 1000:7.1f} мс")
+            if as_items(lots) != expected:
+                failed = True
+                timings[-1] += " РАСХОЖДЕНИЕ"
+        print(f"{path.stem:<18} лотов {len(expected):>4}: " + ", ".join(timings))
+    if failed:
+        sys.exit("Результат разбора отличается от эталона")
+
+
+if __name__ == "__main__":
+    main("--update" in sys.argv)
@@ -0,0 +1,59 @@
+"""
+Проверка режима LISTEN/NOTIFY на локальном Postgres.
+
+Берёт параметры подключения из тех же переменных окружения, что и бот (DB_HOST, DB_NAME, ...),
+накатывает миграции, вставляет в messages тестовые записи и меряет, через сколько
+db.listen_new_messages будит бота. Тестовые записи удаляются в конце.
+
+    python tools/listen_check.py [количество вставок]
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db  # noqa: E402
+
+
+async def main(rounds):
+    if await db.init_db_pool() is None or not await db.apply_migrations():
+        sys.exit("Не удалось подключиться к базе или применить миграции")
+
+    wakeup = asyncio.Event()
+    listener = asyncio.create_task(db.listen_new_messages(wakeup))
+    # Первое срабатывание — сам факт подписки
+    await asyncio.wait_for(wakeup.wait(), timeout=10)
+
+    inserted = []
+    latencies = []
+    try:
+        for _ in range(rounds):
+            wakeup.clear()
+            started = time.perf_counter()
+            row_id = await db.pool.fetchval(
+                '''
+                INSERT INTO messages (сообщение_ссылка, тип_сообщения, send_to_channel)
+                VALUES ('listen_check', 'Аукцион', TRUE)
+                RETURNING id
+                '''
+            )
+            inserted.append(row_id)
+            # send_to_channel = TRUE не должен будить бота, FALSE — должен
+            await db.pool.execute("UPDATE messages SET send_to_channel = FALSE WHERE id = $1", row_id)
+            await asyncio.wait_for(wakeup.wait(), timeout=5)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        listener.cancel()
+        if inserted:
+            await db.pool.execute("DELETE FROM messages WHERE id = ANY($1)", inserted)
+        await db.close_db_pool()
+
+    latencies.sort()
+    print(f"оповещений: {len(latencies)}, "
+          f"медиана {latencies[len(latencies) // 2] * 1000:.1f} мс, максимум {latencies[-1] * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
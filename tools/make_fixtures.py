@@ -0,0 +1,173 @@
+"""
+Генерирует страницы ЕФРСБ для tools/fixtures: объявления о торгах и отчёты оценщика,
+с маленькими и очень большими таблицами лотов. Разметка повторяет страницы
+MessageWindow старого сайта fedresurs: h1.red_small, table.headInfo, разделы
+"Должник" / "Кем опубликовано" / "Публикуемые сведения", table.lotInfo и таблица
+"Сведения об объектах оценки". Содержимое детерминировано, чтобы ожидаемый
+результат разбора (tools/compare_parsers.py) не менялся от запуска к запуску.
+
+    python tools/make_fixtures.py
+"""
+import html
+import random
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+DESCRIPTIONS = [
+    ("Легковые автомобили", "Автомобиль легковой LADA VESTA, 2019 г.в., VIN XTA000000000000, цвет белый"),
+    ("Грузовые автомобили", "Грузовик КАМАЗ 65115, 2012 г.в., самосвал, требует ремонта двигателя"),
+    ("", "Прицеп тракторный 2ПТС-4, 1991 г.в."),
+    ("Жилые помещения", "Квартира, общая площадь 45,6 кв.м, кадастровый № 77:01:0001001:1234, г. Москва"),
+    ("Земельные участки", "Земельный участок, категория земель: земли сельскохозяйственного назначения, 1200 кв.м"),
+    ("", "Нежилое помещение площадью 120 кв.м, этаж 1, г. Казань, ул. Баумана"),
+    ("Нежилые здания", "Здание склада, 540 кв.м, с земельным участком под ним"),
+    ("", "Гараж кирпичный, ГСК «Мотор», бокс 17"),
+    ("Права требования", "Права требования (дебиторская задолженность) к ООО «Вектор» на сумму 1 250 000 руб."),
+    ("", "Доля в уставном капитале ООО «Альфа» в размере 100%"),
+    ("Ценные бумаги", "Акции обыкновенные именные АО «Завод», 1 500 шт."),
+    ("", "Станок токарный 16К20, 1985 г.в., в рабочем состоянии"),
+    ("Оборудование", "Оборудование для производства пластиковых окон, комплект"),
+    ("", "Компьютер персональный, монитор, МФУ — 3 комплекта"),
+    ("Мебель", "Мебель офисная: столы 6 шт., стулья 12 шт., шкафы 4 шт."),
+    ("", "Товарно-материальные ценности (ТМЦ) по перечню, 214 позиций"),
+    ("Сельскохозяйственная техника", "Трактор МТЗ-82.1, 2008 г.в., заводской № 123456"),
+    ("", "Комбайн зерноуборочный Дон-1500Б, 1999 г.в."),
+    ("", "Маломерное судно, лодка моторная «Казанка-5М4»"),
+    ("Иное", "Ювелирные изделия: кольцо золотое 585 пробы, 3,2 г"),
+    ("", "Имущественный комплекс предприятия по переработке молока"),
+    ("", "Жилой дом 86 кв.м с земельным участком 15 соток, Тверская обл."),
+    ("", "Машино-место № 14 в подземном паркинге"),
+    ("", "Мотоцикл Honda CBR600RR, 2007 г.в."),
+    ("", "Облигации федерального займа ОФЗ 26238, 40 шт."),
+    ("", "Право аренды земельного участка сроком на 49 лет"),
+    ("", "Сельскохозяйственные животные: КРС, 35 голов"),
+    ("", "Электроника: телевизоры, ноутбуки, смартфоны — по описи"),
+    ("", "Картина «Пейзаж», холст, масло, 1970-е гг."),
+    ("", ""),
+]
+
+PRICES = ["150 000,00", "1 250 000,00", "3 400 500,00", "89 990,00", "12 000 000,00"]
+
+
+def page_head(title, number, published):
+    return (
+        "<html><head><meta charset=\"utf-8\"><title>Сообщение</title>"
+        "<script>var x = '<div>Должник</div>';</script></head><body>\n"
+        "<div class=\"containerInfo\">\n"
+        f"<h1 class=\"red_small\">\n  {html.escape(title)}\n</h1>\n"
+        "<table class=\"headInfo\">"
+        f"<tr><td>№ сообщения</td><td>{number}</td></tr>"
+        f"<tr><td>Дата публикации</td><td>{published}</td></tr>"
+        "</table>\n"
+    )
+
+
+def debtor_block(rnd, company):
+    if company:
+        name_row = "<tr><td>Наименование должника</td><td>ООО &quot;СТРОЙ-ИНВЕСТ&quot;</td></tr>"
+    else:
+        name_row = "<tr><td>ФИО должника</td><td>Петров Пётр Петрович</td></tr>"
+    return (
+        "<div>Должник</div>\n<table>"
+        f"{name_row}"
+        f"<tr><td>ИНН</td><td>{rnd.randint(10 ** 9, 10 ** 10 - 1)}</td></tr>"
+        "<tr><td>Адрес</td><td>г.&nbsp;Москва,\t ул. Ленина,   д. 1</td></tr>"
+        "<tr><td>Дополнительная информация</td></tr>"
+        "</table>\n"
+    )
+
+
+def arbiter_block(rnd, with_organizer):
+    inn = rnd.randint(10 ** 11, 10 ** 12 - 1)
+    rows = (
+        f"<tr><td>Арбитражный управляющий</td><td>Иванов Иван Иванович (ИНН {inn},  СНИЛС 123-456-789 00)</td></tr>"
+        "<tr><td>Адрес для корреспонденции</td><td>109012, г. Москва, а/я 10</td></tr>"
+        "<tr><td>E-mail</td><td> au.ivanov@example.ru </td></tr>"
+    )
+    if with_organizer:
+        rows += "<tr><td>Организатор торгов</td><td>ООО «Торговый дом» (ИНН 7700000000)</td></tr>"
+    return f"<div><b>Кем опубликовано</b></div>\n<table>{rows}</table>\n"
+
+
+def auction_page(rnd, number, lots):
+    parts = [
+        page_head("Объявление о проведении торгов", number, "14.10.2026"),
+        debtor_block(rnd, company=number % 2 == 0),
+        arbiter_block(rnd, with_organizer=number % 3 == 0),
+        "<div>Публикуемые сведения</div>\n<table>"
+        "<tr><td>Вид торгов</td><td>Открытый аукцион</td></tr>"
+        "<tr><td>Дата и время торгов</td><td>20.11.2026 10:00</td></tr>"
+        "<tr><td>Форма подачи предложения о цене</td><td>Открытая</td></tr>"
+        "</table>\n",
+        "<table class=\"lotInfo\" border=\"1\"><tr><th>Номер лота</th><th>Описание</th>"
+        "<th>Начальная цена, руб</th><th>Шаг</th><th>Задаток</th>"
+        "<th>Информация о снижении цены</th><th>Классификация имущества</th></tr>\n",
+    ]
+    for lot_no in range(1, lots + 1):
+        classification, description = rnd.choice(DESCRIPTIONS)
+        parts.append(
+            f"<tr><td>{lot_no}</td><td>{html.escape(description)}</td>"
+            f"<td>{rnd.choice(PRICES)}</td><td>5,00 %</td><td>20,00 %</td><td></td>"
+            f"<td>{html.escape(classification)}</td></tr>\n"
+        )
+    parts.append("</table>\n</div></body></html>\n")
+    return "".join(parts)
+
+
+def appraisal_page(rnd, number, objects):
+    parts = [
+        page_head("Отчет оценщика об оценке имущества должника", number, "03.10.2026"),
+        debtor_block(rnd, company=number % 2 == 0),
+        arbiter_block(rnd, with_organizer=False),
+        "<div>Сведения об объектах оценки</div>\n"
+        "<table><tr><th>Тип</th><th>Описание</th><th>Дата определения стоимости</th>"
+        "<th>Стоимость,определеннаяоценщиком</th><th>Балансовая стоимость</th></tr>\n",
+    ]
+    for _ in range(objects):
+        classification, description = rnd.choice(DESCRIPTIONS)
+        parts.append(
+            f"<tr><td>{html.escape(classification)}</td><td><span>{html.escape(description)}</span></td>"
+            f"<td>01.10.2026</td><td> {rnd.choice(PRICES)} </td><td></td></tr>\n"
+        )
+    parts.append("</table>\n</div></body></html>\n")
+    return "".join(parts)
+
+
+def other_page(rnd, number):
+    return (
+        page_head("Сообщение о судебном акте", number, "10.10.2026")
+        + debtor_block(rnd, company=True)
+        + arbiter_block(rnd, with_organizer=False)
+        + "</div></body></html>\n"
+    )
+
+
+# Пролог XHTML-страницы: lxml не принимает уже раскодированную строку с объявлением кодировки
+XML_PROLOG = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" '
+    '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">\n'
+)
+
+
+FIXTURES = {
+    "auction_small": lambda rnd: auction_page(rnd, 1001, 3),
+    "auction_large": lambda rnd: auction_page(rnd, 1002, 300),
+    "appraisal_small": lambda rnd: appraisal_page(rnd, 2001, 4),
+    "appraisal_large": lambda rnd: appraisal_page(rnd, 2002, 200),
+    "court_act": lambda rnd: other_page(rnd, 3001),
+    "auction_xml_prolog": lambda rnd: XML_PROLOG + auction_page(rnd, 1003, 3),
+}
+
+
+def main():
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    for name, build in FIXTURES.items():
+        page = build(random.Random(name))
+        (FIXTURES_DIR / f"{name}.html").write_text(page, encoding="utf-8")
+        print(f"{name}.html: {len(page.encode('utf-8')) // 1024} КБ")
+
+
+if __name__ == "__main__":
+    main()
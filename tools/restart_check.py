@@ -0,0 +1,169 @@
+"""
+Проверка остановки и перезапуска бота на локальном Postgres (переменные DB_HOST, DB_NAME, ...)
+с подставными ЕФРСБ и Bot API из tools/bench.py.
+
+Бот запускается настоящим процессом main.py с постоянным WORKER_ID:
+  1. rolling deploy — процесс A отправляет; рядом запускается B с тем же WORKER_ID и ждёт;
+     A получает SIGTERM, дорабатывает не дольше SHUTDOWN_TIMEOUT и освобождает аренду,
+     B сразу продолжает;
+  2. падение — B убивается через SIGKILL посреди отправки, C с тем же WORKER_ID
+     забирает его записи и неотправленные лоты, не дожидаясь конца аренды.
+В конце проверяется, что все пары (лот, канал) отправлены и все записи подтверждены,
+и печатается, сколько сообщений ушло дважды: после SIGTERM — ни одного, после SIGKILL —
+не больше, чем запросов было в пути в момент падения.
+
+    python tools/restart_check.py [--rows 8]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench import FIXTURES_DIR, FakeServers, cleanup, load_pages, seed  # noqa: E402
+
+WORKER_ID = "restart-check"
+SHUTDOWN_TIMEOUT = 3
+LEASE_SECONDS = 15
+
+
+def bot_env(base):
+    env = dict(os.environ)
+    env.update(
+        BOT_TOKEN="123456:restart",
+        TELEGRAM_API_URL=base,
+        WORKER_ID=WORKER_ID,
+        SHUTDOWN_TIMEOUT=str(SHUTDOWN_TIMEOUT),
+        LEASE_SECONDS=str(LEASE_SECONDS),
+        CHANNEL_ID="@restart",
+        CHANNEL_ROUTES="Недвижимость=@restart_realty",
+        CHANNEL_ALL="",
+        PAGE_CACHE_DIR="",
+        METRICS_PORT="0",
+        PUBLICATION_WINDOW="all",
+        SEND_SHARED_BUDGET="0",
+        SEND_GLOBAL_RATE="60",
+        SEND_CHAT_RATE_PER_MINUTE="3600",
+        SEND_CHAT_BURST="60",
+        DB_LISTEN="0",
+        POLL_INTERVAL="1",
+        LOG_LEVEL="WARNING",
+    )
+    return env
+
+
+async def start_bot(base):
+    return await asyncio.create_subprocess_exec(sys.executable, str(ROOT / "main.py"), cwd=ROOT, env=bot_env(base))
+
+
+async def wait_posted(servers, count, timeout=120):
+    deadline = time.monotonic() + timeout
+    while servers.posted < count:
+        if time.monotonic() > deadline:
+            sys.exit(f"ОШИБКА: за {timeout} с опубликовано только {servers.posted} сообщений")
+        await asyncio.sleep(0.05)
+
+
+async def ledger(db, ids):
+    return await db.pool.fetchrow(
+        '''
+        SELECT
+            (SELECT count(*) FROM messages WHERE id = ANY($1) AND NOT send_to_channel) AS unsent,
+            (SELECT count(*) FROM messages WHERE id = ANY($1) AND NOT send_to_channel AND lease_id IS NOT NULL) AS leased,
+            (SELECT count(*) FROM lot_deliveries WHERE message_id = ANY($1) AND status = 'sent') AS sent,
+            (SELECT count(*) FROM lot_deliveries WHERE message_id = ANY($1) AND status = 'sending') AS sending,
+            (SELECT count(*) FROM lot_deliveries
+             WHERE message_id = ANY($1) AND status = 'sending' AND attempted_at IS NOT NULL) AS attempted
+        ''',
+        ids
+    )
+
+
+async def run(args):
+    pages = load_pages(args.pages)
+    servers = FakeServers(pages, 0, 1)
+    await servers.start()
+    os.environ.update(PUBLICATION_WINDOW="all", METRICS_PORT="0")
+    import db
+
+    if await db.init_db_pool() is None or not await db.apply_migrations():
+        sys.exit("Не удалось подключиться к базе или применить миграции")
+    ids = await seed(db, servers.base, pages, args.rows)
+    processes = []
+    try:
+        # 1. Rolling deploy: B стартует, пока A ещё работает, и ждёт блокировки WORKER_ID
+        first = await start_bot(servers.base)
+        processes.append(first)
+        await wait_posted(servers, 100)
+        second = await start_bot(servers.base)
+        processes.append(second)
+        await asyncio.sleep(2)
+        posted_before = servers.posted
+        stopping = time.monotonic()
+        first.send_signal(signal.SIGTERM)
+        code = await first.wait()
+        stopped = time.monotonic() - stopping
+        print(f"A: SIGTERM -> выход за {stopped:.1f} с (код {code}), за это время отправлено "
+              f"{servers.posted - posted_before}")
+        if code != 0 or stopped > SHUTDOWN_TIMEOUT + 5:
+            sys.exit("ОШИБКА: A не остановился вовремя")
+        posted_after_stop = servers.posted
+        resumed = time.monotonic()
+        await wait_posted(servers, posted_after_stop + 1)
+        print(f"B: первое сообщение через {time.monotonic() - resumed:.1f} с после выхода A")
+
+        # 2. Падение: B убивается посреди отправки, C продолжает сразу
+        await wait_posted(servers, servers.posted + 100)
+        second.kill()
+        await second.wait()
+        state = await ledger(db, ids)
+        print(f"B: SIGKILL; в аренде записей {state['leased']}, лотов sending {state['sending']} "
+              f"(из них с попыткой {state['attempted']})")
+        in_flight = state['attempted']
+        posted_after_kill = servers.posted
+        third = await start_bot(servers.base)
+        processes.append(third)
+        resumed = time.monotonic()
+        await wait_posted(servers, posted_after_kill + 1)
+        print(f"C: первое сообщение через {time.monotonic() - resumed:.1f} с после запуска")
+
+        # Лоты с попыткой в момент падения уходят снова только после конца аренды
+        deadline = time.monotonic() + LEASE_SECONDS + 60
+        while (await ledger(db, ids))['unsent'] and time.monotonic() < deadline:
+            await asyncio.sleep(0.5)
+        finished = time.monotonic() - resumed
+        third.send_signal(signal.SIGTERM)
+        code = await third.wait()
+        state = await ledger(db, ids)
+        duplicates = servers.posted - state['sent']
+        print(f"C: всё отправлено за {finished:.1f} с, выход с кодом {code}")
+        print(f"Итог: пар отправлено {state['sent']}, сообщений в Bot API {servers.posted}, "
+              f"дублей {duplicates} (запросов в пути при SIGKILL: {in_flight}), "
+              f"неподтверждённых записей {state['unsent']}")
+        if state['unsent'] or state['sending'] or duplicates > in_flight or duplicates < 0:
+            sys.exit("ОШИБКА")
+    finally:
+        for process in processes:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+        await cleanup(db, ids)
+        await db.close_db_pool()
+        await servers.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка остановки и перезапуска бота")
+    parser.add_argument("--pages", default=str(FIXTURES_DIR), help="каталог с сохранёнными страницами *.html")
+    parser.add_argument("--rows", type=int, default=8, help="сколько записей добавить в messages")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()